@@ -2,26 +2,91 @@
 
 from argparse import ArgumentParser
 import sys
-from runner import Manager
+from runner import Manager, minimize_crash
 
-def main(binary, seed, times: int = 5000):
+def main(binary, seed, times: int = 5000, jobs: int = 1, inflight: int = 1,
+         forkserver: bool = False, timeout: float = None,
+         campaign: bool = False, duration: float = None, output: str = ".",
+         stats: str = None, log: str = None, verbosity: int = 1,
+         scheduler: str = "uniform", feedback: bool = False, capture: str = "full",
+         capture_limit: int = 64, dedup: bool = True, minimize: bool = True,
+         bisect: bool = True):
     """
     Initialize a harness with the given binary and seed, and then start it with a specified timeout.
     """
-    runner = Manager(binary, seed, times)
+    runner = Manager(binary, seed, times, jobs, inflight, forkserver, timeout,
+                     campaign, duration, output, stats, log, verbosity, scheduler,
+                     feedback, capture, capture_limit * 1024, dedup, minimize, bisect)
     runner.run() 
-    
+
+
+def minimize_main(binary, crash, output: str = None, jobs: int = None,
+                  timeout: float = 1.0, max_execs: int = 5000):
+    """
+    Shrink the crashing input in file `crash` for the given binary and write it to `output`.
+    """
+    with open(crash, "rb") as fp:
+        input_bytes = fp.read()
+    try:
+        reduced, execs = minimize_crash(binary if '/' in binary else f'./{binary}', input_bytes,
+                                        timeout, jobs, max_execs)
+    except ValueError:
+        print(f"{crash} doesn't crash {binary}")
+        sys.exit(1)
+    output = output or f"{crash}.min"
+    with open(output, "wb") as fp:
+        fp.write(reduced)
+    print(f"Minimized {crash} from {len(input_bytes)} to {len(reduced)} bytes in {execs} execs, saved to {output}")
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: ./fuzzer program sampleinput.txt")
+    if sys.argv[1:2] == ["minimize"]:
+        parser = ArgumentParser(prog="fuzzer minimize", description="Shrink an input that crashes a binary")
+        parser.add_argument("binary", help="Path to the binary the input crashes")
+        parser.add_argument("crash", help="File holding the crashing input")
+        parser.add_argument("--output", default=None, help="File the minimized input is written to. Defaults to CRASH.min.")
+        parser.add_argument("--jobs", type=int, default=None, help="Candidate inputs run in parallel. Defaults to one per CPU.")
+        parser.add_argument("--timeout", type=float, default=1.0, help="Per-input timeout in seconds; an input that times out doesn't count as crashing. Defaults to 1.")
+        parser.add_argument("--max-execs", type=int, default=5000, help="Most candidate inputs run. Defaults to 5000.")
+        args = parser.parse_args(sys.argv[2:])
+        minimize_main(args.binary, args.crash, args.output, args.jobs, args.timeout, args.max_execs)
+        sys.exit()
+
+    if len(sys.argv) < 3:
+        print("Usage: ./fuzzer program sampleinput.txt\n"
+              "       ./fuzzer minimize program crashinput.txt")
         sys.exit()
 
     
     parser = ArgumentParser(description="A simple fuzzer")
     parser.add_argument("binary", help="Path to the binary to be fuzzing tested")
-    parser.add_argument("seed", help="Seed value to be mutated")
+    parser.add_argument("seed", help="Seed file to be mutated, or a directory of seed files of any supported types, which are scheduled by energy")
     parser.add_argument("--times", type=int, default=5000, help="Maximum testing times for the runner. Defaults to 5000.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes running the binary in parallel. Defaults to 1.")
+    parser.add_argument("--inflight", type=int, default=1, help="Number of target processes kept in flight by the asyncio engine. Defaults to 1.")
+    parser.add_argument("--forkserver", action="store_true", help="Start the binary once under a preloaded fork-server shim and fork a child per input instead of exec'ing it every time.")
+    parser.add_argument("--timeout", type=float, default=None, help="Fixed per-input timeout in seconds. Defaults to one calibrated from the seed and adapted during the run.")
+    parser.add_argument("--campaign", action="store_true", help="Keep fuzzing after crashes and hangs, saving every unique one under OUTPUT/crashes and OUTPUT/hangs.")
+    parser.add_argument("--duration", type=float, default=None, help="Time budget in seconds. With --times 0 this is the only limit.")
+    parser.add_argument("--output", default=".", help="Directory for the crashes/ and hangs/ folders of a campaign. Defaults to the current directory.")
+    parser.add_argument("--stats", default=None, help="JSON file the throughput and stage-timing counters are written to every second.")
+    parser.add_argument("--log", default=None, help="JSON-lines file every exec result is written to.")
+    parser.add_argument("--scheduler", choices=["uniform", "ucb", "thompson"], default="uniform", help="How the next mutator method is picked. ucb and thompson learn from crashes and hangs. Defaults to uniform.")
+    parser.add_argument("--feedback", action="store_true", help="Keep inputs that make the binary behave in a new way (exit code, output, timing) and mutate them as seeds too.")
+    parser.add_argument("--capture", choices=["full", "bounded", "hash", "discard"], default="full", help="What is kept of the binary's stdout: all of it, the first and last --capture-limit KB, a hash, or nothing. Anything but full also keeps only the first and last --capture-limit KB of stderr. Defaults to full.")
+    parser.add_argument("--capture-limit", type=int, default=64, help="KB kept from each end of an output stream by bounded capture. Defaults to 64.")
+    parser.add_argument("--keep-duplicates", action="store_true", help="Run every test case, even one that was already run. By default repeats are skipped.")
+    parser.add_argument("--no-minimize", action="store_true", help="Don't shrink the input that crashed the binary. By default it is minimized into a .min.txt next to the dump.")
+    parser.add_argument("--no-bisect", action="store_true", help="Don't search how much padding a crash found by a padding mutator (long lines, cells or tag names) needs. By default the least crashing length of each padded field is reported.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Print every exec result to the terminal.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print the final crash or timeout report.")
     
     args = parser.parse_args()
-    main(args.binary, args.seed, args.times)
+    if args.forkserver and args.inflight > 1 and args.jobs == 1:
+        parser.error("--forkserver can't be combined with --inflight, the asyncio engine execs every input")
+    main(args.binary, args.seed, args.times, args.jobs, args.inflight, args.forkserver, args.timeout,
+         args.campaign, args.duration, args.output, args.stats, args.log,
+         0 if args.quiet else 1 + args.verbose, args.scheduler, args.feedback,
+         args.capture, args.capture_limit, not args.keep_duplicates, not args.no_minimize,
+         not args.no_bisect)
 
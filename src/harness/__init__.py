@@ -0,0 +1,8 @@
+from harness.buckets import CrashBuckets, STDERR_TAIL, bucket_key, hang_key
+from harness.crashes import CrashStore
+from harness.stats import Stats
+from harness.log import ResultLog, QUIET, NORMAL, VERBOSE
+from harness.feedback import NoveltyTracker, behavior_signature
+from harness.corpus import Corpus
+from harness.dedup import SeenFilter, UniqueInputs
+from harness.minimize import Minimizer, LengthBisector, padding_fields
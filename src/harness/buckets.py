@@ -0,0 +1,92 @@
+import hashlib
+import re
+from typing import Optional, Tuple
+
+# Volatile parts of a crash report: pids, addresses and plain numbers.
+_VOLATILE = re.compile(rb'==\d+==|0x[0-9a-fA-F]+|\d+')
+# Sanitizer stack frames: "#0 0x55d1c3 in parse_row /src/csv.c:42:7"
+_FRAME = re.compile(rb'#(\d+) 0x[0-9a-fA-F]+ in (\S+)')
+# Sanitizer fault line: "... on unknown address 0x000000000000 (pc 0x55d1c3 ..."
+_PC = re.compile(rb'pc 0x([0-9a-fA-F]+)')
+
+# Runs of a repeated byte, cut to one byte when keying hangs.
+_REPEATS = re.compile(rb'(.)\1+', re.S)
+
+STDERR_TAIL = 4096
+FRAMES = 3
+
+
+def fault_signature(stderr: bytes) -> Optional[bytes]:
+    """
+    Pull a faulting-location signature out of a sanitizer report: the top
+    stack frames if there are any, else the page offset of the faulting pc,
+    which survives ASLR. Returns None when stderr has no report.
+    """
+    frames = _FRAME.findall(stderr)
+    if frames:
+        return b'|'.join(func for _, func in frames[:FRAMES])
+    pc = _PC.search(stderr)
+    if pc:
+        return b'pc+' + pc.group(1)[-3:]
+    return None
+
+
+def bucket_key(label: str, stderr: bytes) -> Tuple[str, str]:
+    """
+    Key a finding on its signal label, the faulting-location signature if
+    there is one, and otherwise a hash of its normalized stderr tail.
+    """
+    tail = stderr[-STDERR_TAIL:]
+    signature = fault_signature(tail)
+    if signature is None:
+        signature = _VOLATILE.sub(b'N', tail)
+    return label, hashlib.sha1(signature).hexdigest()[:16]
+
+
+def hang_key(method: str, input_bytes: bytes, stderr: bytes = b'') -> Tuple[str, str]:
+    """
+    Key a hang, which rarely leaves a report, on a hash of the mutator
+    method that produced it, taken as is so nulls1 and nulls2 stay apart,
+    the stderr tail, normalized like `bucket_key`, and the input with every
+    run of a repeated byte cut to one, so padding of different lengths keys
+    alike but different content doesn't.
+    """
+    digest = hashlib.sha1(method.encode())
+    digest.update(b'\0' + _VOLATILE.sub(b'N', stderr[-STDERR_TAIL:]))
+    digest.update(b'\0' + _REPEATS.sub(rb'\1', input_bytes))
+    return "TIMEOUT", digest.hexdigest()[:16]
+
+
+class CrashBuckets:
+    """
+    In-memory index of crash buckets. Tracks, per bucket, how many times it
+    was hit and the size of its smallest reproducer, so telling a duplicate
+    apart is a dict lookup and never touches the disk.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def hits(self, key) -> int:
+        return self._buckets[key][0]
+
+    def add(self, key, input_length: int) -> Tuple[bool, bool]:
+        """
+        Record a hit on bucket `key` with an input of `input_length` bytes.
+
+        Returns:
+            (new, smaller): whether the bucket is new, and whether the input
+            is smaller than every earlier reproducer of an existing bucket.
+        """
+        entry = self._buckets.get(key)
+        if entry is None:
+            self._buckets[key] = [1, input_length]
+            return True, False
+        entry[0] += 1
+        if input_length < entry[1]:
+            entry[1] = input_length
+            return False, True
+        return False, False
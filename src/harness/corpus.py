@@ -0,0 +1,216 @@
+import bisect
+import itertools
+import random
+from typing import Callable, Iterable, Optional
+
+# Most an entry's energy is scaled up or down for its size, and for its speed.
+SCALE_LIMIT = 4.0
+# Energy multiplier of an entry whose recent test cases all crashed.
+PRODUCTIVE_BOOST = 4.0
+# Weight of the newest reward in an entry's recent reward, and how much of
+# every entry's recent reward is left after each `REFRESH` picks.
+REWARD_RATE = 0.25
+FADE = 0.5
+REFRESH = 256
+# Failed mutations in a row after which the error is passed on.
+MAX_ERRORS = 256
+# What a mutation of an entry it doesn't suit raises: a parse or value
+# error (json errors are ValueErrors, ET.ParseError a SyntaxError).
+# Anything else is a mutator bug and is passed on at once.
+MUTATION_ERRORS = (ValueError, SyntaxError)
+
+
+class _Entry:
+    __slots__ = ("seed", "mutator", "size", "exec_ns", "recent")
+
+    def __init__(self, seed: bytes):
+        self.seed = seed  # dropped once the mutator is built
+        self.mutator = None
+        self.size = len(seed)
+        self.exec_ns = None
+        self.recent = 0.0
+
+
+class Corpus:
+    """
+    Growing in-memory set of seeds, used in place of a single mutator.
+
+    Every entry gets its own mutator, built lazily by `factory` the first
+    time the entry is picked. An entry whose mutator can't be built is
+    dropped, and `log` is told. A mutation that fails with one of
+    `MUTATION_ERRORS` is skipped and another entry picked; only after
+    `MAX_ERRORS` failures in a row is the error passed on.
+
+    Entries may be of different types: `factory` picks the mutator for
+    each from its content, for inputs added later just as for the initial
+    seeds, since a mutant rarely still parses as its parent's type.
+    Mutators of the same class share one scheduler, so scheduler feedback and weights
+    keep working through `feedback` and `method_weights`.
+
+    Entries are picked in proportion to their energy. Smaller and faster
+    entries get more, up to `SCALE_LIMIT` times the average each way, and
+    recently productive ones up to `PRODUCTIVE_BOOST` times more on top.
+    The energies are recomputed every `REFRESH` picks, when the recent
+    rewards also fade. Rewards and durations are credited to the entry
+    picked last: exact when each test case is run before the next is
+    generated, approximate with several in flight.
+
+    The initial seeds are never evicted; once `max_size` is reached a
+    random later entry makes room for a new one.
+    """
+
+    def __init__(self, seeds: Iterable[bytes], factory: Callable, max_size: int = 1024,
+                 log: Callable[[str], None] = None):
+        self._factory = factory
+        self._log = log
+        self._entries = [_Entry(seed) for seed in seeds]
+        if not self._entries:
+            raise ValueError("a corpus needs at least one seed")
+        self._initial = len(self._entries)
+        self._max_size = max(max_size, self._initial)
+        self._classes = {}  # mutator class -> first mutator built, which owns the scheduler
+        self._scheduler_cls = None
+        self._in_place = False
+        self._last = None
+        self._cumulative = None
+        self._picks = 0
+        self.last_timings = (0, 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return self
+
+    def add(self, seed: bytes):
+        """Queue `seed` as a new entry; its mutator is built when first picked."""
+        entry = _Entry(seed)
+        if len(self._entries) < self._max_size:
+            self._entries.append(entry)
+        elif len(self._entries) > self._initial:
+            self._entries[random.randrange(self._initial, len(self._entries))] = entry
+        else:
+            return
+        self._cumulative = None
+
+    def _energy(self, entry: _Entry, mean_size: float, mean_ns: float) -> float:
+        size = min(SCALE_LIMIT, max(1 / SCALE_LIMIT, mean_size / max(entry.size, 1)))
+        speed = 1.0
+        if entry.exec_ns is not None and mean_ns:
+            speed = min(SCALE_LIMIT, max(1 / SCALE_LIMIT, mean_ns / max(entry.exec_ns, 1)))
+        return size * speed * (1 + (PRODUCTIVE_BOOST - 1) * entry.recent)
+
+    def _refresh(self, fade: bool = False):
+        entries = self._entries
+        mean_size = sum(entry.size for entry in entries) / len(entries)
+        timed = [entry.exec_ns for entry in entries if entry.exec_ns is not None]
+        mean_ns = sum(timed) / len(timed) if timed else 0
+        self._cumulative = list(itertools.accumulate(
+            self._energy(entry, mean_size, mean_ns) for entry in entries))
+        if fade:
+            for entry in entries:
+                entry.recent *= FADE
+
+    def _pick(self) -> int:
+        if self._picks % REFRESH == 0:
+            self._refresh(fade=True)
+        elif self._cumulative is None:
+            self._refresh()
+        self._picks += 1
+        return bisect.bisect_right(self._cumulative, random.random() * self._cumulative[-1])
+
+    def _mutator(self, entry: _Entry) -> Optional[object]:
+        if entry.mutator is not None:
+            return entry.mutator
+        mutator = self._factory(entry.seed)
+        cls = type(mutator)
+        if cls not in self._classes:
+            if self._scheduler_cls is not None:
+                mutator.use_scheduler(self._scheduler_cls)
+            self._classes[cls] = mutator
+        mutator.scheduler = self._classes[cls].scheduler
+        mutator.use_buffer(self._in_place)
+        entry.mutator = mutator
+        entry.seed = None
+        return mutator
+
+    def _drop(self, idx: int, error: Exception):
+        entry = self._entries[idx]
+        kind = "seed" if idx < self._initial else "corpus entry"
+        del self._entries[idx]
+        if idx < self._initial:
+            self._initial -= 1
+        self._cumulative = None
+        if self._log is not None:
+            reason = str(error)
+            reason = reason if len(reason) <= 80 else reason[:77] + "..."
+            self._log(f"Dropped {kind} {idx} ({entry.size} bytes), no mutator could be built for it: "
+                      f"{type(error).__name__}: {reason}")
+
+    def __next__(self):
+        errors = 0
+        while True:
+            idx = min(self._pick(), len(self._entries) - 1)
+            entry = self._entries[idx]
+            try:
+                mutator = self._mutator(entry)
+            except Exception as e:  # the type it sniffed as doesn't parse it
+                if len(self._entries) == 1:
+                    raise
+                self._drop(idx, e)
+                continue
+            try:
+                result = next(mutator)
+            except MUTATION_ERRORS:  # a method that doesn't suit this entry, say an empty cell
+                errors += 1
+                if errors >= MAX_ERRORS:
+                    raise
+                continue
+            self._last = entry
+            self.last_timings = mutator.last_timings
+            return result
+
+    def feedback(self, name: str, reward: float, duration: float = None):
+        """
+        Credit `reward`, and `duration` (the seconds the test case ran) if
+        given, to the entry picked last, and `reward` to its scheduler.
+        """
+        entry = self._last
+        if entry is None:
+            return
+        entry.recent += REWARD_RATE * (reward - entry.recent)
+        if duration is not None:
+            ns = duration * 1e9
+            entry.exec_ns = ns if entry.exec_ns is None else entry.exec_ns + REWARD_RATE * (ns - entry.exec_ns)
+        try:
+            entry.mutator.feedback(name, reward)
+        except KeyError:
+            pass  # a test case from another kind of mutator, only possible with several in flight
+
+    def method_weights(self) -> dict:
+        """Scheduler weights merged over the mutator classes, averaging a shared method's weight."""
+        merged = {}
+        for mutator in self._classes.values():
+            for name, (plays, reward, weight) in mutator.method_weights().items():
+                merged.setdefault(name, []).append((plays, reward, weight))
+        return {name: (sum(p for p, _, _ in values), sum(r for _, r, _ in values),
+                       sum(w for _, _, w in values) / len(values))
+                for name, values in merged.items()}
+
+    @property
+    def in_place(self) -> bool:
+        return self._in_place
+
+    def use_buffer(self, enabled: bool = True):
+        self._in_place = enabled
+        for entry in self._entries:
+            if entry.mutator is not None:
+                entry.mutator.use_buffer(enabled)
+
+    def use_scheduler(self, scheduler_cls):
+        self._scheduler_cls = scheduler_cls
+        for mutator in self._classes.values():
+            mutator.use_scheduler(scheduler_cls)
+        for entry in self._entries:
+            if entry.mutator is not None:
+                entry.mutator.scheduler = self._classes[type(entry.mutator)].scheduler
@@ -0,0 +1,104 @@
+import json
+import os
+import time
+from typing import Optional
+
+import process
+from harness.buckets import CrashBuckets, bucket_key, hang_key
+
+
+class CrashStore:
+    """
+    Keeps the crashing and hanging inputs found during a campaign, one
+    bucket per distinct bug.
+
+    Crashes are bucketed by signal and crash report (see `bucket_key`);
+    hangs, which rarely leave a report, by the mutator method and a content
+    hash (see `hang_key`). For each bucket only the first reproducer
+    (`<signal>_<bucket>.txt`) and the smallest one seen so far
+    (`<signal>_<bucket>.min.txt`) are written, under `<out_dir>/crashes`
+    and `<out_dir>/hangs`, next to a `.json` file with the metadata of the
+    run that found them.
+
+    Attributes:
+        crashes: number of crash buckets.
+        hangs: number of hang buckets.
+    """
+
+    def __init__(self, out_dir: str = "."):
+        self._crash_dir = os.path.join(out_dir, "crashes")
+        self._hang_dir = os.path.join(out_dir, "hangs")
+        os.makedirs(self._crash_dir, exist_ok=True)
+        os.makedirs(self._hang_dir, exist_ok=True)
+        self._crash_buckets = CrashBuckets()
+        self._hang_buckets = CrashBuckets()
+
+    @property
+    def crashes(self) -> int:
+        return len(self._crash_buckets)
+
+    @property
+    def hangs(self) -> int:
+        return len(self._hang_buckets)
+
+    @staticmethod
+    def signal_name(exitcode: int) -> str:
+        try:
+            return process.ExitCodes(-exitcode).name
+        except ValueError:
+            return f"SIG{-exitcode}"
+
+    def save_crash(self, input_bytes: bytes, exitcode: int, method: str, idx: int,
+                   stderr: bytes = b'') -> Optional[str]:
+        """Save a crashing input. Returns its path, or None if nothing was written."""
+        key = bucket_key(self.signal_name(exitcode), stderr)
+        return self._save(self._crash_dir, self._crash_buckets, key, input_bytes,
+                          method=method, exec_index=idx, exitcode=exitcode)
+
+    @staticmethod
+    def smallest(path: str) -> bytes:
+        """The smallest reproducer saved for the bucket whose first one is at `path`."""
+        base = path[:-len(".txt")]
+        with open(base + ".min.txt" if os.path.exists(base + ".min.txt") else path, "rb") as fp:
+            return fp.read()
+
+    def save_minimized(self, path: str, input_bytes: bytes, execs: int) -> str:
+        """
+        Save `input_bytes`, minimized from the crash saved at `path`, as the
+        bucket's smallest reproducer, with the metadata of its first one.
+        Returns its path.
+        """
+        base = path[:-len(".txt")]
+        with open(base + ".min.txt", "wb") as fp:
+            fp.write(input_bytes)
+        with open(base + ".json") as fp:
+            meta = json.load(fp)
+        meta.update(input_length=len(input_bytes), minimized_execs=execs, time=time.time())
+        with open(base + ".min.json", "w") as fp:
+            json.dump(meta, fp, indent=2)
+        return base + ".min.txt"
+
+    def save_hang(self, input_bytes: bytes, method: str, idx: int,
+                  stderr: bytes = b'') -> Optional[str]:
+        """Save a hanging input. Returns its path, or None if nothing was written."""
+        key = hang_key(method, input_bytes, stderr)
+        return self._save(self._hang_dir, self._hang_buckets, key, input_bytes,
+                          method=method, exec_index=idx, exitcode=None)
+
+    def _save(self, directory: str, buckets: CrashBuckets, key, input_bytes: bytes,
+              **meta) -> Optional[str]:
+        new, smaller = buckets.add(key, len(input_bytes))
+        if not (new or smaller):
+            return None
+
+        label, bucket = key
+        base = os.path.join(directory, f"{label}_{bucket}")
+        path = base + (".txt" if new else ".min.txt")
+        with open(path, "wb") as fp:
+            fp.write(input_bytes)
+
+        meta.update(signal=label, bucket=bucket, hits=buckets.hits(key),
+                    input_length=len(input_bytes), time=time.time())
+        with open(base + (".json" if new else ".min.json"), "w") as fp:
+            json.dump(meta, fp, indent=2)
+        return path
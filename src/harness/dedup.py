@@ -0,0 +1,108 @@
+import hashlib
+import math
+import multiprocessing
+from typing import Tuple
+
+
+class SeenFilter:
+    """
+    Bloom filter of the test cases run so far.
+
+    A test case is hashed once to 128 bits with BLAKE2; the two 64-bit
+    halves give its `k` bit positions by double hashing. Sized for
+    `capacity` test cases at `error_rate` false positives, so the default
+    is a few MB and a lookup is one hash and `k` bit tests. A false
+    positive only ever skips a test case that wasn't run before.
+
+    The bits live in a bytearray, or with `shared` in shared memory that
+    worker processes started afterwards all update.
+    """
+
+    def __init__(self, capacity: int = 1 << 22, error_rate: float = 1e-3, shared: bool = False):
+        bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._size = bits
+        self._k = max(1, round(bits / capacity * math.log(2)))
+        nbytes = (bits + 7) // 8
+        self._bits = multiprocessing.RawArray('B', nbytes) if shared else bytearray(nbytes)
+
+    def _positions(self, data) -> list:
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            digest.update(data)
+        else:  # chunks
+            for chunk in data:
+                digest.update(chunk)
+        value = int.from_bytes(digest.digest(), 'little')
+        h1, h2 = value & ((1 << 64) - 1), value >> 64 | 1
+        return [(h1 + i * h2) % self._size for i in range(self._k)]
+
+    def add(self, data) -> bool:
+        """
+        Add test case `data` (bytes-like or chunks).
+
+        Returns:
+            bool: whether it was (probably) added before.
+        """
+        bits = self._bits
+        seen = True
+        for pos in self._positions(data):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                seen = False
+                bits[pos >> 3] |= mask
+        return seen
+
+
+class UniqueInputs:
+    """
+    Skips test cases `mutator` has handed out before, as far as `seen` can
+    tell, instead of running them again. Deterministic mutator methods
+    return the same test case every time, so after the first run their
+    turns go to other methods; each skip is fed back to the scheduler as
+    reward 0, which teaches the learning schedulers to pick them less.
+
+    After `max_skips` repeats in a row the next test case is run anyway,
+    so a mutator with little left to say can't stall the run. Passes
+    `feedback`, `method_weights` and `use_buffer` through, so it can stand
+    in for the mutator (or `Corpus`) it wraps. `last_timings` covers the
+    skipped test cases too, and `last_skipped` says how many there were.
+    """
+
+    def __init__(self, mutator, seen: SeenFilter = None, max_skips: int = 64):
+        self._fuzz = mutator
+        self._seen = seen if seen is not None else SeenFilter()
+        self._max_skips = max_skips
+        self.last_timings = (0, 0)
+        self.last_skipped = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Tuple[bytes, str]:
+        mutate_ns = format_ns = 0
+        for skipped in range(self._max_skips + 1):
+            input_bytes, name = next(self._fuzz)
+            mutate_ns += self._fuzz.last_timings[0]
+            format_ns += self._fuzz.last_timings[1]
+            if not self._seen.add(input_bytes) or skipped == self._max_skips:
+                break
+            self._fuzz.feedback(name, 0.0)
+        self.last_timings = (mutate_ns, format_ns)
+        self.last_skipped = skipped
+        return input_bytes, name
+
+    def add(self, seed: bytes):
+        self._fuzz.add(seed)
+
+    @property
+    def in_place(self) -> bool:
+        return self._fuzz.in_place
+
+    def use_buffer(self, enabled: bool = True):
+        self._fuzz.use_buffer(enabled)
+
+    def feedback(self, name: str, reward: float, duration: float = None):
+        self._fuzz.feedback(name, reward, duration)
+
+    def method_weights(self) -> dict:
+        return self._fuzz.method_weights()
@@ -0,0 +1,36 @@
+import re
+
+_DIGITS = re.compile(rb'\d+')
+OUTPUT_PREFIX = 256
+
+
+def behavior_signature(exitcode: int, outs: bytes, err: bytes, duration: float) -> int:
+    """
+    Coarse fingerprint of how the target behaved on one input: exit code,
+    log2 buckets of the stdout/stderr lengths and of the execution time in
+    ms, and a hash of the start of stdout with numbers masked out.
+    """
+    head = _DIGITS.sub(b'N', outs[:OUTPUT_PREFIX])
+    return hash((exitcode,
+                 len(outs).bit_length(),
+                 len(err).bit_length(),
+                 int(duration * 1000).bit_length(),
+                 head))
+
+
+class NoveltyTracker:
+    """Remembers the behaviour signatures seen so far."""
+
+    def __init__(self):
+        self._seen = set()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def observe(self, exitcode: int, outs: bytes, err: bytes, duration: float) -> bool:
+        """Record one run and return True if its behaviour is new."""
+        signature = behavior_signature(exitcode, outs, err, duration)
+        if signature in self._seen:
+            return False
+        self._seen.add(signature)
+        return True
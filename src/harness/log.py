@@ -0,0 +1,43 @@
+from typing import Optional
+
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+
+
+class ResultLog:
+    """
+    Output of a run, split by verbosity level.
+
+    Every exec result is written as a JSON line to the file at `path`, if
+    there is one, through a large write buffer so that logging costs no
+    syscall per exec. The terminal only shows events (crashes, hangs,
+    summaries) at NORMAL verbosity and up, and every exec at VERBOSE.
+    """
+
+    def __init__(self, path: Optional[str] = None, verbosity: int = NORMAL,
+                 buffer_size: int = 1 << 16):
+        self.verbosity = verbosity
+        self._fp = open(path, "w", buffering=buffer_size) if path else None
+
+    def exec_result(self, idx: int, name: str, input_length: int, exitcode: Optional[int]):
+        """Log the result of test case `idx`, `exitcode` None meaning a hang."""
+        if self._fp is not None:
+            self._fp.write(f'{{"idx":{idx},"method":"{name}","input_length":{input_length},'
+                           f'"exitcode":{"null" if exitcode is None else exitcode}}}\n')
+        if self.verbosity >= VERBOSE and exitcode is not None:
+            status = 'PASSED' if exitcode >= 0 else 'CRASHED'
+            print(f"{idx+1} {status} | exitcode: {exitcode}")
+            print(f"\t{'method:':<12}{name}")
+            print(f"\t{'input_length:':<12}{input_length}")
+            print("=" * 50)
+
+    def event(self, message: str, level: int = NORMAL):
+        """Show a message on the terminal if the verbosity allows it."""
+        if self.verbosity >= level:
+            print(message, flush=True)
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
@@ -0,0 +1,346 @@
+import itertools
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import process
+from harness.buckets import bucket_key
+
+# What byte-level simplification turns bytes into.
+SIMPLE_BYTE = b'0'
+
+# Shortest run of one repeated byte or byte pair, and shortest XML tag
+# name, taken for a padding field.
+MIN_RUN = 256
+MIN_NAME = 64
+
+_RUN = re.compile(rb'(.{1,2}?)\1{%d,}' % (MIN_RUN // 2 - 1), re.S)
+_LONG_NAME = re.compile(rb'</?([a-z]{%d,})' % MIN_NAME)
+
+
+class _CrashTester:
+    """
+    Runs candidate inputs through `run(data) -> (exitcode, stderr)`, where
+    `exitcode` is None for a timeout, `jobs` at a time on a thread pool,
+    and checks whether they still crash like the original.
+
+    A candidate counts as the same crash if it dies of the same signal and,
+    when the original left a crash report, lands in the same bucket (see
+    `bucket_key`), so a search can't drift onto another bug.
+
+    Attributes:
+        execs: candidates run so far.
+    """
+
+    def __init__(self, run: Callable[[bytes], Tuple[Optional[int], bytes]],
+                 jobs: int = 4, max_execs: int = 5000):
+        self._run = run
+        self._jobs = max(1, jobs)
+        self._max_execs = max_execs
+        self._expected = None
+        self.execs = 0
+
+    def _key(self, exitcode: Optional[int], stderr: bytes):
+        if exitcode is None or exitcode >= 0:
+            return None
+        if not stderr:
+            return exitcode, None
+        return exitcode, bucket_key(str(exitcode), stderr)
+
+    def _start(self, data: bytes):
+        """
+        Raises:
+            ValueError: `data` doesn't crash the target.
+        """
+        self.execs = 1
+        self._expected = self._key(*self._run(data))
+        if self._expected is None:
+            raise ValueError("the input doesn't crash the target")
+
+    def _crashes(self, data: bytes) -> bool:
+        exitcode, stderr = self._run(data)
+        key = self._key(exitcode, stderr)
+        if key is None or key[0] != self._expected[0]:
+            return False
+        return self._expected[1] is None or key == self._expected
+
+    def _all_crashes(self, pool, candidates: Sequence[bytes]) -> List[bool]:
+        """Whether each of `candidates` still crashes; False for those over the budget."""
+        room = max(0, self._max_execs - self.execs)
+        self.execs += min(room, len(candidates))
+        return list(pool.map(self._crashes, candidates[:room])) + [False] * (len(candidates) - room)
+
+    def _first_crash(self, pool, candidates: Iterable[bytes]) -> Optional[int]:
+        """
+        Index of the first of `candidates` that still crashes. They are run
+        `jobs` at a time and only drawn from the iterable a window at a time,
+        so a generator never holds more than `jobs` in memory.
+        """
+        candidates = iter(candidates)
+        start = 0
+        while self.execs < self._max_execs:
+            window = list(itertools.islice(candidates, min(self._jobs, self._max_execs - self.execs)))
+            if not window:
+                break
+            self.execs += len(window)
+            for offset, crashed in enumerate(pool.map(self._crashes, window)):
+                if crashed:
+                    return start + offset
+            start += len(window)
+        return None
+
+
+class Minimizer(_CrashTester):
+    """
+    Shrinks a crashing input with delta debugging, testing the candidates
+    of each round in parallel.
+
+    The passes, each on the result of the last:
+    1. Structure: for CSV, JSON and XML seeds, ddmin over the rows, the
+       items of every array and object, or the children of every element,
+       keeping the rest well-formed.
+    2. Chunk removal: ddmin over the bytes.
+    3. Simplification: ranges of bytes are set to `SIMPLE_BYTE`, halving
+       the ranges that break the crash.
+
+    No more than `max_execs` candidates are run in total.
+    """
+
+    def minimize(self, data: bytes) -> bytes:
+        """
+        The smallest input found that crashes like `data`.
+
+        Raises:
+            ValueError: `data` doesn't crash the target.
+        """
+        self._start(data)
+        with ThreadPoolExecutor(self._jobs) as pool:
+            data = self._structure(pool, data)
+            data = self._ddmin(pool, data, bytes)
+            data = self._simplify(pool, data)
+        return data
+
+    def _ddmin(self, pool, items, build: Callable) -> Sequence:
+        """
+        ddmin over `items` (a list, or bytes), built into a candidate input
+        by `build`: removes ever smaller chunks while the crash holds.
+        """
+        n = 2
+        while items and self.execs < self._max_execs:
+            size = -(-len(items) // n)
+            starts = range(0, len(items), size)
+            found = self._first_crash(pool, (build(items[:lo] + items[lo + size:]) for lo in starts))
+            if found is not None:
+                items = items[:starts[found]] + items[starts[found] + size:]
+                n = max(n - 1, 2)
+            elif n >= len(items):
+                break
+            else:
+                n = min(n * 2, len(items))
+        return items
+
+    def _simplify(self, pool, data: bytes) -> bytes:
+        ranges = [(0, len(data))]
+        while ranges and self.execs < self._max_execs:
+            ranges = [(lo, hi) for lo, hi in ranges
+                      if data[lo:hi].strip(SIMPLE_BYTE)]  # already simple
+            batch = ranges[:self._jobs]
+            candidates = [data[:lo] + SIMPLE_BYTE * (hi - lo) + data[hi:] for lo, hi in batch]
+            found = self._first_crash(pool, candidates)
+            tested = batch if found is None else batch[:found + 1]
+            ranges = ranges[len(tested):]
+            if found is not None:
+                data = candidates[found]
+                tested = tested[:-1]
+            for lo, hi in tested:  # these broke the crash, try their halves
+                if hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    ranges += [(lo, mid), (mid, hi)]
+        return data
+
+    def _structure(self, pool, data: bytes) -> bytes:
+        reducer = {"csv": self._csv, "json": self._json, "xml": self._xml}.get(process.whichType(data))
+        if reducer is None:
+            return data
+        try:
+            return reducer(pool, data)
+        except (ValueError, ET.ParseError):  # not well-formed after all
+            return data
+        except RecursionError:  # nested too deep to serialize, the byte passes still work
+            return data
+
+    def _csv(self, pool, data: bytes) -> bytes:
+        return b''.join(self._ddmin(pool, data.splitlines(keepends=True), b''.join))
+
+    def _json(self, pool, data: bytes) -> bytes:
+        doc = json.loads(data)
+        containers = [doc]
+        while containers and self.execs < self._max_execs:
+            node = containers.pop(0)
+            if isinstance(node, dict):
+                def build(items, node=node):
+                    saved = dict(node)
+                    node.clear()
+                    node.update(items)
+                    try:
+                        return json.dumps(doc).encode()
+                    finally:
+                        node.clear()
+                        node.update(saved)
+                kept = self._ddmin(pool, list(node.items()), build)
+                node.clear()
+                node.update(kept)
+                children = node.values()
+            else:
+                def build(items, node=node):
+                    saved = node[:]
+                    node[:] = items
+                    try:
+                        return json.dumps(doc).encode()
+                    finally:
+                        node[:] = saved
+                node[:] = self._ddmin(pool, node[:], build)
+                children = node
+            containers += [child for child in children if isinstance(child, (dict, list))]
+        result = json.dumps(doc).encode()
+        return result if len(result) < len(data) else data
+
+    def _xml(self, pool, data: bytes) -> bytes:
+        root = ET.fromstring(data)
+        elements = [root]
+        while elements and self.execs < self._max_execs:
+            element = elements.pop(0)
+
+            def build(children: List, element=element):
+                saved = element[:]
+                element[:] = children
+                try:
+                    return ET.tostring(root)
+                finally:
+                    element[:] = saved
+            element[:] = self._ddmin(pool, element[:], build)
+            elements += list(element)
+        result = ET.tostring(root)
+        return result if len(result) < len(data) else data
+
+
+def _runs(data: bytes, seeds) -> list:
+    """Runs of a repeated byte or byte pair, as appended by the plaintext padding methods."""
+    return [([match.span()], len(match.group(1))) for match in _RUN.finditer(data)
+            if match.end() - match.start() >= MIN_RUN]
+
+
+def _long_names(data: bytes, seeds) -> list:
+    """Long lowercase tag names, each with its opening and closing tags as one field."""
+    fields = {}
+    for match in _LONG_NAME.finditer(data):
+        fields.setdefault(match.group(1), []).append(match.span(1))
+    return [(spans, 1) for spans in fields.values()]
+
+
+def _insertion(data: bytes, seeds) -> list:
+    """The bytes inserted into the seed `data` differs least from."""
+    best = None
+    for seed in seeds:
+        prefix = len(os.path.commonprefix([data, seed]))
+        suffix = min(len(os.path.commonprefix([data[::-1], seed[::-1]])),
+                     min(len(data), len(seed)) - prefix)
+        if best is None or prefix + suffix > best[0] + best[1]:
+            best = prefix, suffix
+    if best is None or best[0] + best[1] >= len(data):
+        return []
+    return [([(best[0], len(data) - best[1])], 1)]
+
+
+# Mutator methods that pad fields to overflow them, and how to find the fields.
+PADDING_FIELDS = {
+    **{name: _runs for name in ("add_chars1", "add_chars2", "nulls1", "nulls2", "newlines1",
+                                "newlines2", "format_string1", "format_string2")},
+    "insert_random_bytes": _insertion,
+    "make_longer_tag": _long_names,
+}
+
+
+def padding_fields(name: str, data: bytes, seeds: Sequence[bytes] = ()) -> list:
+    """
+    The padding fields of test case `data`, if mutator method `name` is one
+    that pads, else an empty list. A field is a list of (start, end) spans
+    holding the same padding and the size of its repeating unit in bytes.
+    `seeds` are what the test case may have been mutated from.
+    """
+    finder = PADDING_FIELDS.get(name)
+    return finder(data, seeds) if finder is not None else []
+
+
+class LengthBisector(_CrashTester):
+    """
+    Finds the least padding a crashing input needs, by searching the length
+    of each padding field (see `padding_fields`) for the shortest that still
+    crashes. Each round runs `jobs` lengths in parallel and cuts the range
+    to a `jobs + 1`th, so it takes O(log n) execs per field where refuzzing
+    by hand takes hundreds. The search assumes a longer field never crashes
+    less.
+
+    Every field is first tried on its own, the others cut to nothing. When
+    none crashes alone, the fields are searched together instead, all cut
+    to the same length.
+    """
+
+    def bisect(self, data: bytes, fields: list) -> Tuple[List[Tuple[int, int, int]], bool]:
+        """
+        Search the padding `fields` of crashing input `data`.
+
+        Returns:
+            Tuple[List[Tuple[int, int, int]], bool]: an (offset, length,
+            least crashing length) in bytes for each field found to matter,
+            and whether they only crash together. The list is empty when the
+            input crashes without any padding.
+
+        Raises:
+            ValueError: `data` doesn't crash the target.
+        """
+        self._start(data)
+        full = [(spans[0][1] - spans[0][0]) // unit for spans, unit in fields]
+        none = [0] * len(fields)
+
+        def build(lengths):
+            edits = sorted((start, end, i) for i, (spans, _) in enumerate(fields) for start, end in spans)
+            parts, prev = [], 0
+            for start, end, i in edits:
+                parts += [data[prev:start], data[start:start + lengths[i] * fields[i][1]]]
+                prev = end
+            parts.append(data[prev:])
+            return b''.join(parts)
+
+        def report(i, least):
+            (start, _), unit = fields[i][0][0], fields[i][1]
+            return start, full[i] * unit, min(least, full[i]) * unit
+
+        with ThreadPoolExecutor(self._jobs) as pool:
+            if self._first_crash(pool, [build(none)]) is not None:
+                return [], False
+            alone = [none[:i] + [full[i]] + none[i + 1:] for i in range(len(fields))]
+            crashed = self._all_crashes(pool, [build(lengths) for lengths in alone])
+            results = [report(i, self._search(pool, lambda k, i=i: build(none[:i] + [k] + none[i + 1:]), full[i]))
+                       for i in range(len(fields)) if crashed[i]]
+            if results:
+                return results, False
+            least = self._search(pool, lambda k: build([min(k, n) for n in full]), max(full, default=0))
+            return [report(i, least) for i in range(len(fields))], True
+
+    def _search(self, pool, build: Callable[[int], bytes], hi: int) -> int:
+        """The least length from 1 to `hi` `build` crashes at, given it does at `hi` and not at 0."""
+        lo = 0
+        while hi - lo > 1 and self.execs < self._max_execs:
+            count = min(self._jobs, hi - lo - 1)
+            points = [lo + (hi - lo) * i // (count + 1) for i in range(1, count + 1)]
+            points = sorted(set(point for point in points if lo < point < hi))
+            found = self._first_crash(pool, [build(point) for point in points])
+            if found is None:
+                lo = points[-1]
+            else:
+                lo, hi = (points[found - 1] if found else lo), points[found]
+        return hi
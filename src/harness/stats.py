@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+STAGES = ("mutate", "format", "spawn", "communicate", "teardown")
+HIST_BUCKETS = 64
+
+
+class Stats:
+    """
+    Campaign counters: execs/sec, crash and hang counts, test cases skipped
+    as duplicates, time spent per stage of an exec, and exec counts and
+    yields per mutator method.
+
+    Stage times are kept as nanosecond totals plus a log2 histogram (bucket
+    `i` holds durations in [2**(i-1), 2**i) ns), so recording one is a couple
+    of integer additions. Every `interval` seconds the counters are written
+    to the JSON file at `path`, if there is one, and summarised in a status
+    line redrawn in place on stderr, if it is a terminal. Otherwise the
+    summary is printed as a plain line every `summary_interval` seconds,
+    unless that is None.
+
+    The mutator scheduler's learned weights are included as reported by
+    `update_weights`, merged over every process that reports them.
+    """
+
+    def __init__(self, path: Optional[str] = None, interval: float = 1.0,
+                 status_line: Optional[bool] = None,
+                 summary_interval: Optional[float] = None):
+        self.execs = 0
+        self.crashes = 0
+        self.hangs = 0
+        self.duplicates = 0
+        self._path = path
+        self._interval = interval
+        self._status_line = sys.stderr.isatty() if status_line is None else status_line
+        self._start = time.time()
+        self._next_flush = self._start + interval
+        self._summary_interval = summary_interval
+        self._next_summary = self._start + (summary_interval or 0)
+        self._stage_ns = dict.fromkeys(STAGES, 0)
+        self._stage_hist = {stage: [0] * HIST_BUCKETS for stage in STAGES}
+        self._remote = {}
+        self._methods = {}
+        self._weights = {}
+
+    def add_stage(self, stage: str, ns: int):
+        """Add `ns` nanoseconds spent in `stage` by one exec."""
+        self._stage_ns[stage] += ns
+        self._stage_hist[stage][ns.bit_length()] += 1
+
+    def add_duplicates(self, count: int):
+        """Count `count` test cases skipped because they were run before."""
+        self.duplicates += count
+
+    def snapshot(self) -> dict:
+        """Cumulative stage timings and duplicates, for shipping to another process."""
+        return {"ns": dict(self._stage_ns), "hist": {k: list(v) for k, v in self._stage_hist.items()},
+                "duplicates": self.duplicates}
+
+    def update_remote(self, source, snapshot: dict):
+        """Replace the stage timings last reported by worker `source`."""
+        self._remote[source] = snapshot
+
+    def update_weights(self, source, weights: dict):
+        """Replace the {method: (plays, reward, weight)} last reported by `source`."""
+        self._weights[source] = weights
+
+    def _merged_weights(self) -> dict:
+        merged = {}
+        for weights in self._weights.values():
+            for name, (plays, reward, weight) in weights.items():
+                entry = merged.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += plays
+                entry[1] += reward
+                entry[2] += weight / len(self._weights)
+        return {name: {"plays": plays, "reward": reward, "weight": weight}
+                for name, (plays, reward, weight) in sorted(merged.items())}
+
+    def record_exec(self, method: str, exitcode):
+        """Count one finished exec of `method`, `exitcode` None meaning a hang."""
+        self.execs += 1
+        counts = self._methods.get(method)
+        if counts is None:
+            counts = self._methods[method] = [0, 0, 0]
+        counts[0] += 1
+        if exitcode is None:
+            self.hangs += 1
+            counts[2] += 1
+        elif exitcode < 0:
+            self.crashes += 1
+            counts[1] += 1
+        if time.time() >= self._next_flush:
+            self.flush()
+
+    def _stage_totals(self):
+        ns = dict(self._stage_ns)
+        hist = {k: list(v) for k, v in self._stage_hist.items()}
+        for snapshot in self._remote.values():
+            for stage in STAGES:
+                ns[stage] += snapshot["ns"][stage]
+                hist[stage] = [a + b for a, b in zip(hist[stage], snapshot["hist"][stage])]
+        return ns, hist
+
+    def as_dict(self) -> dict:
+        elapsed = max(time.time() - self._start, 1e-9)
+        ns, hist = self._stage_totals()
+        return {
+            "elapsed": elapsed,
+            "execs": self.execs,
+            "execs_per_sec": self.execs / elapsed,
+            "crashes": self.crashes,
+            "hangs": self.hangs,
+            "duplicates": self.duplicates + sum(s["duplicates"] for s in self._remote.values()),
+            "stages": {
+                stage: {
+                    "total_sec": ns[stage] / 1e9,
+                    "mean_us": ns[stage] / 1e3 / max(1, sum(hist[stage])),
+                    "hist_log2_ns": hist[stage],
+                }
+                for stage in STAGES
+            },
+            "methods": {
+                name: {
+                    "execs": execs,
+                    "crashes": crashes,
+                    "hangs": hangs,
+                    "crash_yield": crashes / execs,
+                }
+                for name, (execs, crashes, hangs) in sorted(self._methods.items())
+            },
+            "scheduler": self._merged_weights(),
+        }
+
+    def status(self, stats: Optional[dict] = None) -> str:
+        stats = stats or self.as_dict()
+        elapsed = int(stats["elapsed"])
+        total = sum(s["total_sec"] for s in stats["stages"].values()) or 1
+        shares = " ".join(f"{stage} {s['total_sec'] / total:.0%}"
+                          for stage, s in stats["stages"].items())
+        return (f"[{elapsed // 3600:02}:{elapsed // 60 % 60:02}:{elapsed % 60:02}] "
+                f"execs {stats['execs']} ({stats['execs_per_sec']:.0f}/s) "
+                f"crashes {stats['crashes']} hangs {stats['hangs']} "
+                f"dups {stats['duplicates']} | {shares}")
+
+    def flush(self, final: bool = False):
+        """Write the stats file and redraw the status line."""
+        self._next_flush = time.time() + self._interval
+        stats = self.as_dict()
+        if self._path:
+            tmp = f"{self._path}.tmp"
+            with open(tmp, "w") as fp:
+                json.dump(stats, fp, indent=2)
+            os.replace(tmp, self._path)
+        if self._status_line:
+            sys.stderr.write("\r\033[K" + self.status(stats) + ("\n" if final else ""))
+            sys.stderr.flush()
+        elif self._summary_interval and (final or time.time() >= self._next_summary):
+            self._next_summary = time.time() + self._summary_interval
+            sys.stderr.write(self.status(stats) + "\n")
+            sys.stderr.flush()
@@ -1,9 +1,30 @@
-from mutators.mutator_base import MutatorBase
-from mutators.csv_mutator import CSV_Mutator
-from mutators.json_mutator import JSON_Mutator
-from mutators.plaintext_mutator import PLAINTEXT_Mutator
-from mutators.xml_mutator import XML_Mutator
-from mutators.jpeg_mutator import JPEG_Mutator
-from mutators.pdf_mutator import PDF_Mutator
-from mutators.jpeg_mutator import JPEG_Mutator
+import importlib
 
+from mutators.mutator_base import MutatorBase, deterministic
+from mutators.chunks import Chunks
+from mutators.scheduler import SCHEDULERS, UniformScheduler, UCBScheduler, ThompsonScheduler
+
+# file type -> (module, class). A mutator's module is only imported when its
+# type comes up, so startup doesn't pay for the ones a campaign never uses.
+MUTATORS = {
+    "csv": ("mutators.csv_mutator", "CSV_Mutator"),
+    "json": ("mutators.json_mutator", "JSON_Mutator"),
+    "plaintext": ("mutators.plaintext_mutator", "PLAINTEXT_Mutator"),
+    "xml": ("mutators.xml_mutator", "XML_Mutator"),
+    "jpeg": ("mutators.jpeg_mutator", "JPEG_Mutator"),
+    "pdf": ("mutators.pdf_mutator", "PDF_Mutator"),
+}
+
+
+def mutator_for(file_type: str):
+    """The mutator class for `file_type`, as named by `process.whichType`."""
+    module, name = MUTATORS[file_type]
+    return getattr(importlib.import_module(module), name)
+
+
+def __getattr__(name: str):
+    # mutators.CSV_Mutator and the rest still work, loaded on first access
+    for module, cls in MUTATORS.values():
+        if cls == name:
+            return getattr(importlib.import_module(module), cls)
+    raise AttributeError(f"module 'mutators' has no attribute '{name}'")
@@ -0,0 +1,149 @@
+import random
+import struct
+from collections import deque
+from typing import List, Tuple
+
+_np = False  # not looked for yet
+
+
+def _numpy():
+    """numpy if it is installed, else None. Imported on first use, it takes a while to load."""
+    global _np
+    if _np is False:
+        try:
+            import numpy
+        except ImportError:  # numpy is optional, the pure Python path does the same job
+            numpy = None
+        _np = numpy
+    return _np
+
+# AFL's interesting values, packed in both byte orders.
+_INTERESTING = [
+    struct.pack(fmt, v)
+    for fmt, values in (
+        ('<b', (-128, -1, 0, 1, 16, 32, 64, 100, 127)),
+        ('<h', (-32768, -129, 128, 255, 256, 512, 1000, 1024, 4096, 32767)),
+        ('>h', (-32768, -129, 128, 255, 256, 512, 1000, 1024, 4096, 32767)),
+        ('<i', (-2147483648, -100663046, -32769, 32768, 65535, 65536, 100663045, 2147483647)),
+        ('>i', (-2147483648, -100663046, -32769, 32768, 65535, 65536, 100663045, 2147483647)),
+    )
+    for v in values
+]
+
+OPS = ("flip", "replace", "interesting", "insert", "delete")
+RESIZING_OPS = ("insert", "delete")
+
+# (op, positions, payload): bit masks or byte values per position for flip and
+# replace, the bytes written or inserted for interesting and insert, and the
+# number of bytes removed for delete.
+Edit = Tuple[str, list, object]
+
+
+def apply_edit(buffer, edit: Edit):
+    """Apply a same-length `edit` to a `MutationBuffer` in place."""
+    op, positions, payload = edit
+    if op == "flip":
+        for pos, mask in zip(positions, payload):
+            buffer.xor_byte(pos, mask)
+    elif op == "replace":
+        for pos, value in zip(positions, payload):
+            buffer.set_byte(pos, value)
+    else:
+        buffer.overwrite(positions[0], payload)
+
+
+def build_edit(sample: bytes, edit: Edit) -> bytes:
+    """A new bytes object with an insert or delete `edit` applied to `sample`."""
+    op, positions, payload = edit
+    pos = positions[0]
+    if op == "insert":
+        return sample[:pos] + payload + sample[pos:]
+    return sample[:pos] + sample[pos + payload:]
+
+
+class HavocBatch:
+    """
+    Draws byte-level edits of one sample a batch at a time.
+
+    Each edit is one of `OPS` at up to `max_stack` random offsets (bit
+    flips, random byte replacements, AFL interesting values, one inserted
+    or deleted run of up to `max_block` bytes). The random choices for a
+    whole batch are drawn at once, so the per-mutant cost is applying the
+    edit: a handful of byte writes with `apply_edit`, or one copy of the
+    sample with `build_edit` for the ops in `RESIZING_OPS`.
+
+    Uses numpy when it is installed and the `random` module otherwise; both
+    draw their state from `random`, so `random.seed` makes runs repeatable.
+    """
+
+    def __init__(self, sample: bytes, batch_size: int = 64, max_stack: int = 8,
+                 max_block: int = 1024):
+        self._size = len(sample)
+        self._batch_size = batch_size
+        self._max_stack = max_stack
+        self._max_block = max_block
+        self._queue = deque()
+        np = _numpy()
+        self._rng = np.random.default_rng(random.getrandbits(64)) if np is not None else None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def pop(self) -> Edit:
+        """Take the next edit, generating a batch if needed."""
+        if not self._queue:
+            self._queue.extend(self.generate())
+        return self._queue.popleft()
+
+    def generate(self) -> List[Edit]:
+        if self._rng is not None:
+            return self._generate_numpy()
+        return [self._edit_python() for _ in range(self._batch_size)]
+
+    def _generate_numpy(self) -> List[Edit]:
+        np = _numpy()
+        rng = self._rng
+        size = self._size
+        k = self._batch_size
+
+        ops = (rng.integers(0, len(OPS), k) if size else np.full(k, OPS.index("insert"))).tolist()
+        stacks = rng.integers(1, self._max_stack + 1, k)
+        offsets = np.concatenate(([0], np.cumsum(stacks))).tolist()
+        positions = rng.integers(0, max(size, 1), offsets[-1]).tolist()
+        values = rng.integers(0, 256, offsets[-1]).tolist()
+        masks = np.left_shift(1, rng.integers(0, 8, offsets[-1])).tolist()
+        blocks = rng.integers(1, self._max_block + 1, k).tolist()
+        picks = rng.integers(0, len(_INTERESTING), k).tolist()
+
+        batch = []
+        for i in range(k):
+            op = OPS[ops[i]]
+            lo, hi = offsets[i], offsets[i + 1]
+            if op == "flip":
+                batch.append((op, positions[lo:hi], masks[lo:hi]))
+            elif op == "replace":
+                batch.append((op, positions[lo:hi], values[lo:hi]))
+            elif op == "interesting":
+                value = _INTERESTING[picks[i]]
+                batch.append((op, [max(0, min(positions[lo], size - len(value)))], value))
+            elif op == "insert":
+                batch.append((op, [positions[lo] if size else 0], rng.bytes(blocks[i])))
+            else:
+                batch.append((op, [positions[lo]], blocks[i]))
+        return batch
+
+    def _edit_python(self) -> Edit:
+        size = self._size
+        op = random.choice(OPS) if size else "insert"
+        if op == "insert":
+            return op, [random.randint(0, size)], random.randbytes(random.randint(1, self._max_block))
+        if op == "delete":
+            return op, [random.randrange(size)], random.randint(1, self._max_block)
+        if op == "interesting":
+            value = random.choice(_INTERESTING)
+            return op, [max(0, min(random.randrange(size), size - len(value)))], value
+
+        positions = [random.randrange(size) for _ in range(random.randint(1, self._max_stack))]
+        if op == "flip":
+            return op, positions, [1 << random.randrange(8) for _ in positions]
+        return op, positions, [random.randrange(256) for _ in positions]
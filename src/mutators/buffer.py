@@ -0,0 +1,48 @@
+class MutationBuffer:
+    """
+    A writable copy of a seed that is mutated in place and put back
+    afterwards.
+
+    Every write logs the (offset, old bytes) it replaces, and `revert`
+    replays the log backwards, so a test case costs as much as the bytes
+    it changes rather than a copy of the whole seed. Only same-length
+    edits are possible; anything that inserts or deletes has to build a
+    new bytes object instead.
+
+    `view` is handed out without copying and stays valid, but its contents
+    change on the next write or `revert`. Whoever keeps a test case beyond
+    that must take `bytes(view)` first.
+    """
+
+    def __init__(self, seed: bytes):
+        self._buf = bytearray(seed)
+        self._undo = []
+        self.view = memoryview(self._buf)
+
+    def __len__(self):
+        return len(self._buf)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._undo)
+
+    def overwrite(self, offset: int, data: bytes):
+        """Replace the bytes at `offset` with `data`, clipped to the buffer."""
+        data = data[:len(self._buf) - offset]
+        self._undo.append((offset, self._buf[offset:offset + len(data)]))
+        self._buf[offset:offset + len(data)] = data
+
+    def set_byte(self, offset: int, value: int):
+        self._undo.append((offset, self._buf[offset:offset + 1]))
+        self._buf[offset] = value
+
+    def xor_byte(self, offset: int, mask: int):
+        self._undo.append((offset, self._buf[offset:offset + 1]))
+        self._buf[offset] ^= mask
+
+    def revert(self):
+        """Undo every write since the last revert."""
+        buf = self._buf
+        for offset, old in reversed(self._undo):
+            buf[offset:offset + len(old)] = old
+        self._undo.clear()
@@ -0,0 +1,44 @@
+from typing import Callable, Iterable, Iterator, Optional
+
+
+class Chunks:
+    """
+    A test case given as a sequence of byte chunks instead of one bytes
+    object, for mutators whose output is too big to build up front.
+
+    `source` is called for every pass, so the chunks can be replayed (a
+    suspected hang is re-run, a crash is saved) without ever being held in
+    memory together. The runner streams them to the target's stdin.
+    `bytes(chunks)` joins them for callers that need to keep the input.
+    """
+
+    def __init__(self, source: Callable[[], Iterable[bytes]], length: Optional[int] = None):
+        self._source = source
+        self._length = length
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._source())
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = sum(map(len, self))
+        return self._length
+
+    def __bytes__(self) -> bytes:
+        return b''.join(self)
+
+    def replace(self, old: bytes, new: bytes) -> "Chunks":
+        """Chunks with `old` replaced by `new` in every chunk (not across chunk boundaries)."""
+        length = self._length if len(old) == len(new) else None
+        return Chunks(lambda: (chunk.replace(old, new) for chunk in self), length)
+
+
+def repeated(unit: bytes, count: int, block: int = 4096) -> Chunks:
+    """`unit * count` as chunks of up to `block` units."""
+    def source():
+        full = unit * block
+        for _ in range(count // block):
+            yield full
+        if count % block:
+            yield unit * (count % block)
+    return Chunks(source, len(unit) * count)
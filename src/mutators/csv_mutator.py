@@ -1,15 +1,22 @@
-from copy import deepcopy
+from .chunks import Chunks
 from .mutator_base import MutatorBase
 import random
-import pwnlib.util.fiddling as bits
+
+# Bytes of whole lines put in each chunk of a streamed test case.
+STREAM_BLOCK = 1 << 16
 
 
 class CSV_Mutator(MutatorBase):
     """
     Fuzzer generates inputs by mutating seeds using a generator pattern.
 
+    Cell mutations return a sparse overlay {row index: serialized row} over
+    the seed rather than a copy of the table, and `format_output` splices
+    the changed rows into the pre-serialized seed, so one changed cell costs
+    O(row) in Python and a single join of the file.
+
     Attributes:
-        _content: 2D array for csv cells.
+        _content: 2D array for csv cells. Shared by every test case, never modified.
         shape: Dimensions (rows x cols) of the csv.
     """
 
@@ -21,6 +28,16 @@ class CSV_Mutator(MutatorBase):
         self._content = [line.split(b',') for line in lines[1:]]
         self.shape = (len(self._content), len(self._header.split(b',')))
 
+        # The seed body and where each row sits in it, for splicing overlays.
+        self._body = b'\n'.join([self._header] + lines[1:])
+        self._row_spans = []
+        end = len(self._header)
+        for line in lines[1:]:
+            start = end + 1
+            end = start + len(line)
+            self._row_spans.append((start, end))
+        self._body_has_nulls = b'\x00' in self._body
+
     def _select_random_cell(self):
         """
         Select and return a random cell's coordinates (row, col) from the content.
@@ -36,33 +53,32 @@ class CSV_Mutator(MutatorBase):
 
         return row, col
 
+    def _with_cell(self, row: int, col: int, cell: bytes) -> dict:
+        """Overlay that replaces one cell of the seed."""
+        cells = list(self._content[row])
+        cells[col] = cell
+        return {row: b','.join(cells)}
+
     def _mutate_replace_random_byte(self):
         """
         Mutate a byte in a random cell
         """
-        mutated_content = deepcopy(self._content)
         row, col = self._select_random_cell()
-        mutated_content[row][col] = self._alter_random_byte(mutated_content[row][col])
-        return mutated_content
+        return self._with_cell(row, col, self._alter_random_byte(self._content[row][col]))
 
     def _mutate_insert_random_bytes(self):
         """
         Insert random bytes into a randomly selected cell.
         """
-        mutated_content = deepcopy(self._content)
         row, col = self._select_random_cell()
-        mutated_content[row][col] = self._insert_multiple_bytes(mutated_content[row][col])
-    
-        return mutated_content
+        return self._with_cell(row, col, self._insert_multiple_bytes(self._content[row][col]))
 
     def _mutate_delete_random_byte(self):
         """
         Delete a byte from a random selected cell
         """
-        mutated_content = deepcopy(self._content)
         row, col = self._select_random_cell()
-        mutated_content[row][col] = self._delete_byte(mutated_content[row][col])
-        return mutated_content
+        return self._with_cell(row, col, self._delete_byte(self._content[row][col]))
 
     # more fuzzing methods
     def _mutate_insert_multiple_rows(self):
@@ -72,35 +88,66 @@ class CSV_Mutator(MutatorBase):
             for _ in range(self.shape[1])
         ] for _ in range(4096)]
 
-    def _convert_to_csv(self, raw):
-        """Convert the raw data to CSV string."""
-        return b'\n'.join(b','.join(row) for row in raw)
-
-    def _replace_null_bytes(self, content):
-        """Replace null bytes with random non-null bytes."""
-        replacement_byte = random.randint(0x1, 0xff).to_bytes(1, 'little')
-        return content.replace(b'\x00', replacement_byte)
+    def _splice(self, overlay: dict, replacement_byte: bytes) -> list:
+        """Parts of the seed body with the rows in `overlay` swapped in."""
+        body = memoryview(self._body)
+        parts = []
+        prev = 0
+        for row in sorted(overlay):
+            start, end = self._row_spans[row]
+            parts.append(body[prev:start])
+            parts.append(overlay[row].replace(b'\x00', replacement_byte))
+            prev = end
+        parts.append(body[prev:])
+        return parts
 
-    def _ensure_newline_ending(self, content):
-        """Ensure the content ends with a newline."""
-        return content if content.endswith(b'\n') else content + b'\n'
-    
     def format_output(self, raw):
         """
         Construct a CSV file from the given raw data. 
     
         This function will first concatenate the header and the rows, then 
         replace any null bytes to avoid format issues, and finally ensure 
-        that the resulting bytes end with a newline.
+        that the resulting bytes end with a newline. Whole tables are
+        returned as `Chunks`, one per line.
     
         Args:
-            raw (List[bytes]): The raw data rows to be formatted into CSV.
+            raw (List[bytes] or dict): The raw data rows to be formatted into
+                CSV, or an overlay of serialized rows over the seed.
 
         Returns:
-            bytes: A well-formatted CSV in byte form.
+            bytes or Chunks: A well-formatted CSV in byte form.
         """
-
-        csv_content = self._header + b'\n' + self._convert_to_csv(raw)
-        formatted_content = self._replace_null_bytes(csv_content)
-        
-        return self._ensure_newline_ending(formatted_content)
+        if isinstance(raw, dict) and not self._body_has_nulls:
+            replacement_byte = random.randint(0x1, 0xff).to_bytes(1, 'little')
+            parts = [part for part in self._splice(raw, replacement_byte) if part]
+            if not parts or parts[-1][-1:] != b'\n':
+                parts.append(b'\n')
+            return b''.join(parts)
+        if isinstance(raw, dict):
+            raw = [overlay.split(b',') if (overlay := raw.get(i)) is not None else row
+                   for i, row in enumerate(self._content)]
+        return self._stream_rows(raw, random.randint(0x1, 0xff).to_bytes(1, 'little'))
+
+    def _stream_rows(self, rows, replacement_byte: bytes):
+        """The header and `rows` as chunks of whole lines, about `STREAM_BLOCK` bytes each, streamed to the target."""
+        header = self._header
+        last = rows[-1] if rows else None
+        last_line = (header if last is None else b','.join(last)).replace(b'\x00', replacement_byte)
+        ending = b'' if last_line.endswith(b'\n') else b'\n'
+        length = len(header) + len(ending) + sum(
+            sum(map(len, row)) + len(row) for row in rows)
+
+        def blocks():
+            block = [header.replace(b'\x00', replacement_byte)]
+            size = len(block[0])
+            for row in rows:
+                line = b','.join(row).replace(b'\x00', replacement_byte)
+                block += (b'\n', line)
+                size += len(line) + 1
+                if size >= STREAM_BLOCK:
+                    yield b''.join(block)
+                    block, size = [], 0
+            block.append(ending)
+            yield b''.join(block)
+
+        return Chunks(blocks, length)
@@ -1,8 +1,10 @@
 import re
 import random
-from pwnlib.util import fiddling as bits
 
-from .mutator_base import MutatorBase
+from .mutator_base import MutatorBase, deterministic
+
+# Every byte with its bits in reverse order, for translate().
+_REVERSED_BITS = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
 
 class JPEG_Mutator(MutatorBase):
     """
@@ -54,6 +56,8 @@ class JPEG_Mutator(MutatorBase):
         self._comments = list()
         self._app_meta = dict()
         self._sos_info = dict()
+        self._segments = list()
+        self._by_marker = dict()
         self.frame = dict()
         self.scan = dict()
         self._parse(seed)
@@ -63,30 +67,43 @@ class JPEG_Mutator(MutatorBase):
 
     def format_output(self, mutated_content: bytes ) -> bytes:
         """
-        Construct a JPEG file
-    
-        This function will assembles the JPEG file from the class structure
-    
+        Methods already return a whole JPEG in byte form
+
         Args:
-            mutable_content (List[bytes]): Raw mutable content
+            mutable_content (bytes): Raw mutable content
 
         Returns:
             bytes: A formatted JPEG in byte form.
         """
-        self._parse(self._seed)
         return mutated_content
 
-    def _format(self) -> bytes:
-        head = self._asm_app()
-        head += self._asm_qt()
-        head += self._asm_sof()
-        head += self._asm_ht()
-        head += self._asm_sos()
-        
-        self._parse(self._seed)
-        
-        ret =  self.Markers["SOI"] + head + self._body + self.Markers["EOI"]
-        return ret
+    def _assemble(self, overlay: dict) -> bytes:
+        """
+        Assembles the seed with some of its segments replaced
+
+        Untouched segments are joined straight from views of the seed, so
+        the cost is one copy of the output whatever was replaced.
+
+        Args:
+            overlay (dict): Replacement bytes by index into `_segments`
+
+        Returns:
+            bytes: A formatted JPEG in byte form.
+        """
+        view = memoryview(self._seed)
+        parts = list()
+        prev = 0
+        for idx in sorted(overlay):
+            _, offset, length = self._segments[idx]
+            parts.append(view[prev:offset])
+            parts.append(overlay[idx])
+            prev = offset + length
+        parts.append(view[prev:])
+        return b''.join(parts)
+
+    def _segment(self, idx: int) -> memoryview:
+        _, offset, length = self._segments[idx]
+        return memoryview(self._seed)[offset:offset + length]
 
     def _mutate_length(self):
         new = self._seed
@@ -143,26 +160,37 @@ class JPEG_Mutator(MutatorBase):
         loc = random.randbytes(1)
         return self._seed.replace(loc, b'')
 
+    def _mutate_havoc(self):
+        return self._havoc(self._seed)
+
+    @deterministic
     def _mutate_just_magic(self):
         return self.Magic["JPEG"] + self.Markers["EOI"]
 
+    @deterministic
     def _mutate_eoi_before(self):
         return self.Markers["EOI"] + self._seed
 
+    @deterministic
     def _mutate_swap_magic(self):
         return self.Markers["EOI"] + self._seed[12:4] + self.Magic["JPEG"]
 
     def _mutate_len_hf(self):
-        index = self._seed.find(b'\xff\xc4')
-
-        return self._seed[:index + 2] + b'\x00\xee' + self._seed[index + 4:]
+        dht = self._by_marker.get(0xc4)
+        index = self._segments[dht[0]][1] if dht else -1
+        buffer = self._edit(self._seed)
+        buffer.overwrite(index + 2, b'\x00\xee')
+        return self._emit(buffer)
 
+    @deterministic
     def _mutate_remove_end(self):
         return self._seed.replace(self.Markers["EOI"], b'')
 
+    @deterministic
     def _mutate_remove_start(self):
         return self._seed.replace(self.Magic["JPEG"], b'')
 
+    @deterministic
     def _mutate_remove_magic(self):
         new = self._seed.replace(self.Magic["JPEG"], b'')
         new =  new.replace(self.Markers["EOI"], b'')
@@ -171,21 +199,21 @@ class JPEG_Mutator(MutatorBase):
     def _mutate_qt_new(self):
         """
         This function mutates the input file by adding a quantization table
-        with random bytes
+        with random bytes after the last one
     
         Args:
             None
 
         Returns:
-            None
+            bytes: The mutated JPEG
         """
 
-        qt = dict()
-        qt['id'] = len(self._q_table) + 1
-        qt['table'] = [random.randbytes(8) for _ in range(8)]
-        self._q_table.append(qt)
-        return self._format()
-        self.q_table.append(qt)
+        table = self._asm_qt(len(self._q_table) + 1, random.randbytes(64))
+        dqt = self._by_marker.get(0xdb)
+        if dqt:
+            return self._assemble({dqt[-1]: self._segment(dqt[-1]).tobytes() + table})
+        sos = self._by_marker[0xda][0]
+        return self._assemble({sos: table + self._segment(sos)})
 
     def _mutate_qt_random(self):
         """
@@ -196,15 +224,11 @@ class JPEG_Mutator(MutatorBase):
             None
 
         Returns:
-            None
+            bytes: The mutated JPEG
         """
         tdx = random.randint(0, random.randint(0,len(self._q_table)-1))
-        qt = dict()
-        qt['id'] = tdx + 1
-        qt['table'] = [random.randbytes(8) for _ in range(8)]
-        
-        self._q_table[tdx] = qt
-        return self._format()
+        table = self._asm_qt(tdx + 1, random.randbytes(64))
+        return self._assemble({self._by_marker[0xdb][tdx]: table})
 
     def _mutate_hf(self):
         """
@@ -215,12 +239,11 @@ class JPEG_Mutator(MutatorBase):
             None
 
         Returns:
-            None
+            bytes: The mutated JPEG
         """
 
-
-        new_ht = dict()
         tdx = random.randint(0, len(self._hf_table) - 1)
+        new_ht = dict()
         new_ht['class'] = random.randint(0, 1)
         new_ht['destination'] = random.randint(0, 1)
         encodings = list()
@@ -229,8 +252,7 @@ class JPEG_Mutator(MutatorBase):
             encodings.append(random.randbytes(n_encodings))
         
         new_ht['encodings'] = encodings
-        self._hf_table[tdx] = new_ht
-        return self._format()
+        return self._assemble({self._by_marker[0xc4][tdx]: self._asm_ht(new_ht)})
 
     def _mutate_sof(self):
         """
@@ -241,77 +263,191 @@ class JPEG_Mutator(MutatorBase):
             None
 
         Returns:
-            None
+            bytes: The mutated JPEG
         """
         
-        self._sof_info['height'] = random.randint(0, 0xFFFF)
-        self._sof_info['width'] = random.randint(0, 0xFFFF)
-        return self._format()
+        idx = self._sof_segment
+        frame = bytearray(self._segment(idx))
+        frame[5:7] = random.randint(0, 0xFFFF).to_bytes(2, 'big')
+        frame[7:9] = random.randint(0, 0xFFFF).to_bytes(2, 'big')
+        return self._assemble({idx: frame})
     
+    @deterministic
     def _mutate_body(self):
         """
         This function mutates the input file by swapping the input file's body bits
+
+        Reversing the body's bit string is reversing its bytes and the bits
+        of each byte, done with a slice and a translation table.
     
         Args:
             None
 
         Returns:
-            None
+            bytes: The mutated JPEG
         """
         
-        data = bits.bits(self._body)
-        new_body = list()
-        d_length = len(data)
-        for bdx, _ in enumerate(data):
-            new_body.append(data[d_length - bdx -1])
-        self._body = bits.unbits(new_body)
-        return self._format()
+        return self._assemble({self._body_segment: self._body[::-1].translate(_REVERSED_BITS)})
 
-    def _mutate_sos(self) -> bytes:
-        self._sos_info['n_components'] = random.randint(0, 0xFF -1)
+    def _mutate_body_reverse_range(self):
+        """
+        This function mutates the input file by reversing the order of a
+        random range of the body's bytes
+
+        Args:
+            None
+
+        Returns:
+            bytes: The mutated JPEG
+        """
+
+        body = self._body
+        low = random.randrange(len(body) + 1)
+        high = random.randint(low, len(body))
+        view = memoryview(body)
+        new_body = b''.join((view[:low], body[low:high][::-1], view[high:]))
+        return self._assemble({self._body_segment: new_body})
+
+    def _mutate_body_rst(self):
+        """
+        This function mutates the input file by injecting up to eight
+        restart markers, numbered on from a random one, at random offsets
+        of the body
+
+        Args:
+            None
+
+        Returns:
+            bytes: The mutated JPEG
+        """
+
+        body = memoryview(self._body)
+        offsets = sorted(random.randint(0, len(body)) for _ in range(random.randint(1, 8)))
+        first = random.randrange(8)
+        parts = list()
+        prev = 0
+        for n, offset in enumerate(offsets):
+            parts.append(body[prev:offset])
+            parts.append(bytes((0xff, 0xd0 + (first + n) % 8)))
+            prev = offset
+        parts.append(body[prev:])
+        return self._assemble({self._body_segment: b''.join(parts)})
+
+    def _mutate_body_stuffing(self):
+        """
+        This function mutates the input file by corrupting the byte stuffing
+        of the body: the 0x00 after a 0xFF is removed or replaced, so the
+        decoder reads a marker in the middle of the scan. A body without
+        stuffing gets a bare 0xFF instead.
 
-        for i in self._sos_info['components']:
-            i['id'] = random.randint(0, 0xF -1)
-            i['dc'] = random.randint(0, 0xF -1)
-            i['ac'] = random.randint(0, 0xF -1)
+        Args:
+            None
+
+        Returns:
+            bytes: The mutated JPEG
+        """
+
+        body = self._body
+        start = random.randrange(len(body) + 1)
+        index = body.find(b'\xff\x00', start)
+        if index < 0:
+            index = body.find(b'\xff\x00', 0, start + 1)
+        view = memoryview(body)
+        if index < 0:
+            new_body = b''.join((view[:start], b'\xff', view[start:]))
+        elif random.randint(0, 1):
+            new_body = b''.join((view[:index + 1], view[index + 2:]))
+        else:
+            new_body = b''.join((view[:index + 1], bytes((random.randint(1, 0xFF),)),
+                                 view[index + 2:]))
+        return self._assemble({self._body_segment: new_body})
+
+    def _mutate_body_truncate(self):
+        """
+        This function mutates the input file by cutting the body short, so
+        the image ends part of the way through its MCUs
+
+        The body is not decoded, so the only MCU boundaries known are the
+        restart markers; the cut goes right after a random one of them, or
+        at a random offset when there are none.
+
+        Args:
+            None
+
+        Returns:
+            bytes: The mutated JPEG
+        """
+
+        body = self._body
+        end = random.randrange(len(body) + 1)
+        rst = re.compile(b'\xff[\xd0-\xd7]')
+        marker = rst.search(body, end) or rst.search(body, 0, end)
+        if marker:
+            end = marker.end()
+        return self._assemble({self._body_segment: memoryview(body)[:end]})
+
+    def _mutate_sos(self) -> bytes:
+        sos = dict()
+        sos['n_components'] = random.randint(0, 0xFF -1)
+        sos['components'] = list()
+        for _ in self._sos_info['components']:
+            sos['components'].append({
+                'id': random.randint(0, 0xF -1),
+                'dc': random.randint(0, 0xF -1),
+                'ac': random.randint(0, 0xF -1),
+            })
             
-        self._sos_info['spectral_select'][0] = random.randint(0, 0xFF -1)
-        self._sos_info['spectral_select'][1] = random.randint(0, 0xFF -1)
-        self._sos_info['successive_approx'] = random.randint(0, 0xFF -1)
+        sos['spectral_select'] = [random.randint(0, 0xFF -1), random.randint(0, 0xFF -1)]
+        sos['successive_approx'] = random.randint(0, 0xFF -1)
         
-        return self._format()
+        return self._assemble({self._by_marker[0xda][0]: self._asm_sos(sos)})
 
     def _parse(self, sample: bytes):
         """
         Parses a byte stream from a JPEG file into the class' structure
 
+        Walks the marker segments once, up to and including the first start
+        of scan, and indexes each as (marker, offset, length) in `_segments`,
+        by position in `_by_marker`. Everything after the scan header, up to
+        the EOI, is the entropy-coded body; it is indexed as the last
+        segment, with marker None.
+
         Args:
             sample (bytes): Raw bytes of the JPEG file
 
         Returns:
             null
-        """
 
-        head, _, body = sample.partition(self.Markers["SOS"])
-        self._body = body[:-2]
-        markers = list(self.Markers.values())
-        match_expr =  re.compile(b'|'.join(markers), re.MULTILINE)
-        matches = re.finditer(match_expr, head)
-        for m in matches:
-            low, high = m.span()
-            field = head[low:high]
-            length = None
-            content = None
-            if content != self.Markers["DRI"]:
-                length = int.from_bytes(head[high:high + 2], 'big') - 2
-                content = head[high + 2:high + 2 + length]
-            
-            if re.match(self.Markers["SOF"], field):
-                self._sof_info = self._parse_sof(content, field[1])
-            elif re.match(self.Markers["APP"], field):
+        Raises:
+            ValueError: `sample` is not a JPEG with a start of scan
+        """
+
+        if not sample.startswith(self.Markers["SOI"]):
+            raise ValueError("no start of image marker")
+        pos = 2
+        marker = None
+        while marker != 0xda:
+            while sample[pos:pos + 2] == b'\xff\xff':  # fill bytes
+                pos += 1
+            field = sample[pos:pos + 2]
+            if len(field) < 2 or field[0] != 0xff or field == self.Markers["EOI"]:
+                raise ValueError(f"no start of scan, stopped at offset {pos}")
+            marker = field[1]
+            if 0xd0 <= marker <= 0xd7 or marker == 0x01:  # no length or content
+                length = 2
+            else:
+                length = int.from_bytes(sample[pos + 2:pos + 4], 'big') + 2
+            content = sample[pos + 4:pos + length]
+            self._by_marker.setdefault(marker, list()).append(len(self._segments))
+            self._segments.append((marker, pos, length))
+            pos += length
+
+            if re.fullmatch(self.Markers["SOF"], field):
+                self._sof_info = self._parse_sof(content, marker)
+                self._sof_segment = len(self._segments) - 1
+            elif re.fullmatch(self.Markers["APP"], field):
                 index = int.from_bytes(field, 'big') - 0xffe0
                 self._app_meta[index] = content
-               
             elif field == self.Markers["DHT"]:
                 table = self._parse_hf(content)
                 self._hf_table.append(table)
@@ -321,12 +457,16 @@ class JPEG_Mutator(MutatorBase):
                 table['table'] = [content[1 + idx * 8:1 + idx * 8 + 8] for idx in range(8)]
                 self._q_table.append(table)
             elif field == self.Markers["DRI"]:
-                self._infotart_interval = int.from_bytes(head[low + 2:low + 4], 'big')
+                self._infotart_interval = int.from_bytes(content[:2], 'big')
             elif field == self.Markers["COM"]:
                 self._comments.append(content)
+            elif field == self.Markers["SOS"]:
+                self._sos_info = self._parse_sos(content)
 
-        self._sos_info = self._parse_sos(body[2:2 + 10])
-        self._body = body[2 + 10:-2]
+        end = len(sample) - 2 if sample.endswith(self.Markers["EOI"]) else len(sample)
+        self._body = sample[pos:end]
+        self._body_segment = len(self._segments)
+        self._segments.append((None, pos, end - pos))
 
     def _parse_sof(self, content: bytes, type: bytes) -> dict:
         """
@@ -441,150 +581,67 @@ class JPEG_Mutator(MutatorBase):
         
         return components
  
-    def _asm_app(self) -> bytes:
+    def _asm_segment(self, marker: bytes, content: bytes) -> bytes:
         """
-        Assembles class structure's application metadata
-        into a bytes stream
+        Assembles a marker segment into a bytes stream
 
         Args:
-            none
+            marker (bytes): The segment's two marker bytes
+            content (bytes): The segment's content, without the length
 
         Returns:
-            bytes: byte stream of application metadata
+            bytes: byte stream of the segment
         """
-        
-        content = bytes()
-        for k, v in self._app_meta.items():
-            marker = k + 0xffe0
-            marker = marker.to_bytes(2, 'big')
-            content_len = len(v) + 2
-            content += marker + content_len.to_bytes(2, 'big') + v
-        return content
-    
-    def _asm_qt(self) -> bytes:
-        """
-        Assembles class structure's quantization tables
-        into a bytes stream
-
-        Args:
-            none
-
-        Returns:
-            bytes: byte stream of quantization tables
-        """
-        
-        content = bytes()
-        for tbl in self._q_table:
-            table = bytes()
-            try:
 
-                table += tbl['id'].to_bytes(1, 'big')
-            except: 
-                r = random.randint(0, 254)
-                table += r.to_bytes(1, 'big')
-            table += b''.join(tbl['table'])
-            length = len(table) + 2
-            content +=  self.Markers["DQT"] + length.to_bytes(2, 'big') + table
-        return content
+        return b''.join((marker, (len(content) + 2).to_bytes(2, 'big'), content))
 
-    def _asm_sof(self) -> bytes:
+    def _asm_qt(self, qt_id: int, table: bytes) -> bytes:
         """
-        Assembles class structure's frame
-        into a bytes stream
+        Assembles a quantization table into a bytes stream
 
         Args:
-            none
+            qt_id (int): Table id, a random one if it doesn't fit in a byte
+            table (bytes): The table's 64 values
 
         Returns:
-            bytes: byte stream of frame
+            bytes: byte stream of the quantization table
         """
-        
-        info = bytes()
-        info += self._sof_info['precision'].to_bytes(1, 'big')
-        info += self._sof_info['height'].to_bytes(2, 'big')
-        info += self._sof_info['width'].to_bytes(2, 'big')
-        info += self._sof_info['n_components'].to_bytes(1, 'big')
-        info += self._asm_comp()
-
-        marker = b'\xff' + self._sof_info['type'].to_bytes(1, 'big')
-        length = len(info) + 2
-        return marker + length.to_bytes(2, 'big') + info
-    
-    def _asm_comp(self) -> bytes:
+
+        if qt_id > 0xFF:
+            qt_id = random.randint(0, 254)
+        return self._asm_segment(self.Markers["DQT"], bytes((qt_id,)) + table)
+
+    def _asm_ht(self, tbl: dict) -> bytes:
         """
-        Assembles class structure frame's components 
-        into a bytes stream
+        Assembles a huffman table into a bytes stream
 
         Args:
-            none
+            tbl (dict): structure contains info on the huffman table
 
         Returns:
-            bytes: byte stream of frame's components
-        """
-        
-        comps = bytes()
-        for i in range(self._sof_info['n_components']):
-            comp = self._sof_info['components'][i]
-            cBytes = bytes()
-            cBytes += comp['id'].to_bytes(1, 'big')
-            cBytes += ((comp['scale'][1] << 4) + comp['scale'][0]).to_bytes(1, 'big')
-            cBytes += comp['dqt_index'].to_bytes(1, 'big')
-            comps += cBytes
-        return comps
-    
-    def _asm_ht(self) -> bytes:
+            bytes: byte stream of the huffman table
         """
-        Assembles class structure's huffman table 
-        into a bytes stream
 
-        Args:
-            none
+        size = bytes(len(e) for e in tbl['encodings'])
+        table = b''.join((bytes(((tbl['class'] << 4) + tbl['destination'],)), size,
+                          *tbl['encodings']))
+        return self._asm_segment(self.Markers["DHT"], table)
 
-        Returns:
-            bytes: byte stream of huffman tables
+    def _asm_sos(self, info: dict) -> bytes:
         """
-        
-        content = bytes()
-        for tbl in self._hf_table:
-            table = bytes()
-            table += ((tbl['class'] << 4) + tbl['destination']).to_bytes(1, 'big')
-            size = bytes() 
-            encode = bytes()
-            for e in tbl['encodings']:
-                size += len(e).to_bytes(1, 'big')
-                if len(e) > 0:
-                    encode += e
-            table += size + encode
-            length = len(table) + 2
-            content +=  self.Markers["DHT"] + length.to_bytes(2, 'big') + table
-        return content
-
-    def _asm_sos(self) -> bytes:
-        """
-        Assembles class structure start of scan
-        into a bytes stream
+        Assembles a start of scan header into a bytes stream
 
         Args:
-            none
+            info (dict): structure contains info on the JPEG's scan
 
         Returns:
             bytes: byte stream of start of scan
         """
-        
-        sos = bytes()
-        sos += self._sos_info['n_components'].to_bytes(1, 'big')
-
-        for idx, _ in enumerate(self._sos_info['components']):
-            component = self._sos_info['components'][idx]
-            comp = bytes()
-            comp += component['id'].to_bytes(1, 'big')
-            comp += ((component['dc'] << 4) + component['ac']).to_bytes(1, 'big')
-            
-            sos += comp
-
-        sos += self._sos_info['spectral_select'][0].to_bytes(1, 'big')
-        sos += self._sos_info['spectral_select'][1].to_bytes(1, 'big')
-        sos += self._sos_info['successive_approx'].to_bytes(1, 'big')
-        length = len(sos) + 2
 
-        return self.Markers["SOS"] + length.to_bytes(2, 'big') + sos
+        sos = bytearray((info['n_components'],))
+        for component in info['components']:
+            sos.append(component['id'])
+            sos.append((component['dc'] << 4) + component['ac'])
+        sos.extend(info['spectral_select'])
+        sos.append(info['successive_approx'])
+        return self._asm_segment(self.Markers["SOS"], sos)
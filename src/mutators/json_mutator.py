@@ -1,9 +1,30 @@
 from .mutator_base import MutatorBase
-from random import randint, choice
+from random import randint, choice, random
 
 import json
+import math
 import string
 
+# Literals at the edges of common integer and float representations.
+BOUNDARY_NUMBERS = [
+    b'0', b'-0', b'-1', b'127', b'-129', b'255', b'65535', b'65536',
+    b'2147483647', b'-2147483648', b'2147483648', b'4294967295', b'4294967296',
+    b'9223372036854775807', b'-9223372036854775808', b'18446744073709551616',
+    b'1e308', b'-1e308', b'1e309', b'5e-324', b'1e-400', b'0.1e-1', b'1' * 400,
+]
+
+# A value of every JSON type, for swapping a node's type.
+TYPED_VALUES = [
+    ("null", b'null'), ("bool", b'true'), ("bool", b'false'),
+    ("number", b'0'), ("number", b'1.5'), ("string", b'""'), ("string", b'"A"'),
+    ("array", b'[]'), ("array", b'[null]'), ("object", b'{}'), ("object", b'{"": null}'),
+]
+
+LONG_STRING_UNITS = [b'A', b'%s', b'%n', b'\\u0000', b'\\"', b'\\ud800', b'\xff']
+
+# Chance that _mutate_json_obj_bits touches any one byte.
+_BIT_RATE = 1 / 11
+
 def helper_rand_obj(idx, obj_len, key_type):
     temp_obj = {}
     for i in range(idx):
@@ -20,6 +41,12 @@ def helper_rand_obj(idx, obj_len, key_type):
 class JSON_Mutator(MutatorBase):
     """
     Mutator that uses a provided sample JSON input to create and return altered inputs
+
+    The seed is serialized once (with json.dumps' separators) while every
+    node's type and byte span in the result is indexed, along with every
+    object entry. Structural mutations pick a node from the index, build
+    replacement bytes for it alone and splice them into the cached
+    serialization, so untouched siblings are never re-serialized.
     """
 
     def __init__(self, sample_input):
@@ -28,12 +55,131 @@ class JSON_Mutator(MutatorBase):
         sample_input: sample json input str read in from file, this is converted to json obj
         """
         super().__init__()
+        self._seed = sample_input
         self._input_json_obj = json.loads(sample_input)
 
+        self._nodes = []      # (start, end, kind) of every value, children first
+        self._by_kind = {}    # kind -> indices into _nodes
+        self._entries = []    # (start, value start, end) of every "key": value
+        parts = []
+        self._index(self._input_json_obj, parts, 0)
+        self._doc = b''.join(parts)
+
+    def _index(self, value, parts: list, offset: int) -> int:
+        """
+        Serialize `value` into `parts` from byte `offset` on, recording the
+        spans of it and everything below it. Returns the end offset.
+        """
+        start = offset
+        if isinstance(value, dict):
+            kind = "object"
+            parts.append(b'{')
+            offset += 1
+            for i, (key, child) in enumerate(value.items()):
+                if i:
+                    parts.append(b', ')
+                    offset += 2
+                key_bytes = json.dumps(key).encode() + b': '
+                parts.append(key_bytes)
+                entry_start, offset = offset, offset + len(key_bytes)
+                value_start = offset
+                offset = self._index(child, parts, offset)
+                self._entries.append((entry_start, value_start, offset))
+            parts.append(b'}')
+            offset += 1
+        elif isinstance(value, list):
+            kind = "array"
+            parts.append(b'[')
+            offset += 1
+            for i, child in enumerate(value):
+                if i:
+                    parts.append(b', ')
+                    offset += 2
+                offset = self._index(child, parts, offset)
+            parts.append(b']')
+            offset += 1
+        else:
+            if isinstance(value, str):
+                kind = "string"
+            elif isinstance(value, bool):
+                kind = "bool"
+            elif value is None:
+                kind = "null"
+            else:
+                kind = "number"
+            data = json.dumps(value).encode()
+            parts.append(data)
+            offset += len(data)
+
+        self._by_kind.setdefault(kind, []).append(len(self._nodes))
+        self._nodes.append((start, offset, kind))
+        return offset
+
+    def _pick(self, kind: str = None):
+        """A random node of type `kind`, or of any type if there are none."""
+        candidates = self._by_kind.get(kind)
+        if candidates:
+            return self._nodes[choice(candidates)]
+        return self._nodes[randint(0, len(self._nodes) - 1)]
+
+    def _splice(self, start: int, end: int, data: bytes) -> bytes:
+        """The seed document with bytes [start, end) replaced by `data`."""
+        doc = self._doc
+        return b''.join((doc[:start], data, doc[end:]))
+
     def format_output(self, output):
         """Methods already return in byte format"""
         return output
 
+    def _mutate_havoc(self):
+        """
+        Applies generic byte/bit mutations to the raw sample input
+        """
+        return self._havoc(self._seed)
+
+    def _mutate_node_boundary_number(self):
+        """
+        Replaces a number (or any node if there are none) with a boundary value
+        """
+        start, end, _ = self._pick("number")
+        return self._splice(start, end, choice(BOUNDARY_NUMBERS))
+
+    def _mutate_node_long_string(self):
+        """
+        Replaces a string (or any node if there are none) with a very long one
+        """
+        start, end, _ = self._pick("string")
+        length = choice((256, 4096, 65536))
+        return self._splice(start, end, b'"' + choice(LONG_STRING_UNITS) * length + b'"')
+
+    def _mutate_node_type_swap(self):
+        """
+        Replaces any node with a value of a different type
+        """
+        start, end, kind = self._pick()
+        swapped = choice([data for other, data in TYPED_VALUES if other != kind])
+        return self._splice(start, end, swapped)
+
+    def _mutate_node_deep_nesting(self):
+        """
+        Replaces any node with deeply nested arrays or objects
+        """
+        start, end, _ = self._pick()
+        depth = choice((64, 1024, 1 << 14, 1 << 16))
+        opener, closer = choice(((b'[', b']'), (b'{"a": ', b'}')))
+        return self._splice(start, end, opener * depth + b'null' + closer * depth)
+
+    def _mutate_node_duplicate_key(self):
+        """
+        Repeats an object entry, with its own value or one of another type
+        """
+        if not self._entries:
+            return b'{"a": ' + self._doc + b', "a": ' + self._doc + b'}'
+        start, value_start, end = choice(self._entries)
+        doc = self._doc
+        value = doc[value_start:end] if randint(0, 1) else choice(TYPED_VALUES)[1]
+        return b''.join((doc[:end], b', ', doc[start:value_start], value, doc[end:]))
+
     def _mutate_json_obj_int(self):
         """
         Creates JSON inputs of various sizes and returns it as a byte array
@@ -69,17 +215,14 @@ class JSON_Mutator(MutatorBase):
     def _mutate_json_obj_bits(self):
         """
         Mutates random bits in the sample input and returns mutated bits
-        """
-        json_str = json.dumps(self._input_json_obj)
 
-        random_factor = 10
-
-        for i in range(500):
-            json_byte_array = bytearray(json_str, "UTF-8")
-            for j in range(len(json_byte_array)):
-                rand_n = randint(0, random_factor)
-                if rand_n == 0:
-                    json_byte_array[j] ^= randint(0, 200)
-
-        
-        return json_byte_array
+        Each byte is hit with probability _BIT_RATE; the gaps between hits
+        are drawn from the geometric distribution, so the cost is per hit.
+        """
+        buffer = self._edit(self._doc)
+        log_miss = math.log(1 - _BIT_RATE)
+        pos = int(math.log(1 - random()) / log_miss)
+        while pos < len(buffer):
+            buffer.xor_byte(pos, randint(0, 200))
+            pos += 1 + int(math.log(1 - random()) / log_miss)
+        return self._emit(buffer)
@@ -1,7 +1,28 @@
+import functools
 import random
-import pwnlib.util.fiddling as bits
+from time import perf_counter_ns
 from typing import Tuple, Optional
 
+from .batch import HavocBatch, RESIZING_OPS, apply_edit, build_edit
+from .buffer import MutationBuffer
+from .scheduler import UniformScheduler
+
+def deterministic(method):
+    """
+    Marks a `_mutate_` method whose result depends on nothing but the seed.
+    It runs the first time it is picked; after that the result is handed
+    out again from the mutator's payload cache. Only for methods that
+    return fresh bytes or chunks, never a view from `_emit`.
+    """
+    @functools.wraps(method)
+    def cached(self):
+        payload = self._payloads.get(method.__name__)
+        if payload is None:
+            payload = self._payloads[method.__name__] = method(self)
+        return payload
+    return cached
+
+
 class MutatorBase:
     """
     Base class for all Mutators. Provides mutation methods at the byte/bit level.
@@ -11,6 +32,20 @@ class MutatorBase:
     - Override `__init__` if needed.
     - Implement the `format_output` method.
     - Add new mutator methods starting with `_mutate_`.
+
+    Which mutator method runs next is up to `scheduler`, uniform by default.
+    Swap it with `use_scheduler` and feed results back with `feedback`.
+
+    Mutators that work on raw bytes can draw generic byte/bit mutants of a
+    sample from `_havoc`, which generates them a batch at a time.
+
+    Same-length edits of a sample go through `_edit` and `_emit`. With
+    `use_buffer`, `_emit` hands out a view of a buffer that is mutated in
+    place and reverted on the next call, instead of a fresh copy; callers
+    must copy any output they keep past the next `__next__`.
+
+    Methods that always return the same thing for a seed are decorated
+    with `deterministic`, so it is generated only once.
     """
 
     def __init__(self):
@@ -20,6 +55,38 @@ class MutatorBase:
         self._mutate_methods = [
             getattr(self, name) for name in dir(self) if self.is_mutate_method(name)
         ] 
+        self._method_index = {
+            method.__name__[8:]: idx for idx, method in enumerate(self._mutate_methods)
+        }
+        self.scheduler = UniformScheduler(len(self._mutate_methods))
+        self.last_timings = (0, 0)
+        self._havoc_batch = None
+        self._havoc_sample = None
+        self.in_place = False
+        self._buffer = None
+        self._buffer_sample = None
+        self._payloads = {}
+
+    def use_scheduler(self, scheduler_cls):
+        """Pick mutator methods with a fresh `scheduler_cls` instance from now on."""
+        self.scheduler = scheduler_cls(len(self._mutate_methods))
+
+    def use_buffer(self, enabled: bool = True):
+        """Hand out in-place views instead of copies from `_emit` from now on."""
+        self.in_place = enabled
+
+    def feedback(self, name: str, reward: float, duration: float = None):
+        """
+        Reward the mutator method called `name` (as returned by `__next__`)
+        for the behaviour its last output caused, from 0 for nothing
+        interesting to 1 for a crash. How long the output ran, `duration`,
+        only matters to a `harness.Corpus` scheduling seeds.
+        """
+        self.scheduler.reward(self._method_index[name], reward)
+
+    def method_weights(self) -> dict:
+        """What the scheduler has learned, as {name: (plays, reward, weight)}."""
+        return dict(zip(self._method_index, self.scheduler.weights()))
 
     @staticmethod
     def is_mutate_method(name: str) -> bool:
@@ -40,14 +107,65 @@ class MutatorBase:
     def __next__(self) -> bytes:
         """
         Generates mutated inputs. It uses self._mutate_methods and then formats the output.
+        The nanoseconds spent mutating and formatting are left in `last_timings`.
         
         Returns:
             bytes: The mutated input.
         """
-        choice = random.choice(self._mutate_methods)
+        choice = self._mutate_methods[self.scheduler.choose()]
+        start = perf_counter_ns()
+        if self._buffer is not None:
+            self._buffer.revert()
         new_content = choice()
-        return self.format_output(new_content), choice.__name__[8:]
+        mutated = perf_counter_ns()
+        output = self.format_output(new_content)
+        self.last_timings = (mutated - start, perf_counter_ns() - mutated)
+        return output, choice.__name__[8:]
     
+    def _havoc(self, sample: bytes) -> bytes:
+        """
+        Next generic byte-level mutant of `sample` (bit flips, byte
+        replacements, interesting values, inserted or deleted runs).
+        Mutants are generated in batches and drained one per call; a new
+        batch is started whenever `sample` changes.
+
+        Args:
+            sample (bytes): bytes to be mutated
+
+        Returns:
+            mutated bytes
+        """
+        if self._havoc_sample is not sample:
+            self._havoc_batch = HavocBatch(sample)
+            self._havoc_sample = sample
+        edit = self._havoc_batch.pop()
+        if edit[0] in RESIZING_OPS:
+            return build_edit(sample, edit)
+        buffer = self._edit(sample)
+        apply_edit(buffer, edit)
+        return self._emit(buffer)
+
+    def _edit(self, sample: bytes) -> MutationBuffer:
+        """
+        The mutation buffer of `sample`, to overwrite in place and pass to
+        `_emit`. Only one sample per mutator has a buffer at a time.
+        """
+        if self._buffer_sample is not sample:
+            self._buffer = MutationBuffer(sample)
+            self._buffer_sample = sample
+        return self._buffer
+
+    def _emit(self, buffer: MutationBuffer):
+        """
+        The mutated contents of `buffer`: the buffer's own view in
+        `in_place` mode, otherwise a copy, after which the buffer is reverted.
+        """
+        if self.in_place:
+            return buffer.view
+        output = bytes(buffer.view)
+        buffer.revert()
+        return output
+
     @classmethod
     def _alter_random_byte(cls, sample: bytes) -> bytes:
         """
@@ -58,10 +176,9 @@ class MutatorBase:
         Returns:
             mutated bytes
         """
-        byte_list = list(sample)
-        pos = random.randrange(len(byte_list))
-        byte_list[pos] = random.randrange(256)
-        return bytes(byte_list)
+        mutated = bytearray(sample)
+        mutated[random.randrange(len(mutated))] = random.randrange(256)
+        return bytes(mutated)
 
 
     @staticmethod
@@ -80,9 +197,8 @@ class MutatorBase:
         Returns:
             mutated bytes
         """
-        sample_array = bytearray(sample)
-        del sample_array[random.randrange(len(sample_array))]
-        return bytes(sample_array)
+        pos = random.randrange(len(sample))
+        return sample[:pos] + sample[pos + 1:]
 
     @classmethod
     def _insert_multiple_bytes(cls,
@@ -91,7 +207,6 @@ class MutatorBase:
                                pos: Optional[int] = None) -> bytes:
         """
         Inserts `n_bytes` random bytes into `sample` at `pos`.
-        Warning: Performance slows with large `n_bytes`.
 
         Args:
             sample (bytes): Target for mutation.
@@ -103,11 +218,9 @@ class MutatorBase:
         """
 
         n_bytes = n_bytes or random.randint(1, 0xFFFF)
-        pos = pos or random.randint(0, len(sample))
+        pos = random.randint(0, len(sample)) if pos is None else pos
 
-        new_bytes = bytes(random.randint(0, 0xFF) for _ in range(n_bytes))
-    
-        return sample[:pos] + new_bytes + sample[pos:]
+        return sample[:pos] + random.randbytes(n_bytes) + sample[pos:]
 
 
     def format_output(self, mutable_content: bytes) -> bytes:
@@ -1,6 +1,5 @@
-from .mutator_base import MutatorBase
+from .mutator_base import MutatorBase, deterministic
 import random
-from copy import deepcopy
 
 class PDF_Mutator(MutatorBase):
     """
@@ -12,6 +11,7 @@ class PDF_Mutator(MutatorBase):
         Initialise class
         """
         super().__init__()
+        self._seed = bytes(sample_input)
 
     def format_output(self, output):
         """Methods already return in byte format"""
@@ -22,46 +22,44 @@ class PDF_Mutator(MutatorBase):
         """
         Mutates pdf bytes with specific char set
         """
-        char_set = {b'%', b'(', b')', b'<', b'>', b'/'}
-        byte_list = list(self)
-        pos = random.randrange(len(byte_list))
-        byte_list[pos] = random.choice(char_set)
-        return bytes(byte_list)
+        char_set = (b'%', b'(', b')', b'<', b'>', b'/')
+        pos = random.randrange(len(self._seed))
+        return self._seed[:pos] + random.choice(char_set) + self._seed[pos + 1:]
     
+    @deterministic
     def _mutate_pdf_remove_eof(self):
         """
         Removes eof
         """
-        mutated = self[0: -4]
-        return mutated
+        eof = self._seed.rfind(b'%%EOF')
+        return self._seed[:eof] if eof != -1 else self._seed[:-4]
     
     def _mutate_pdf_alter_version(self):
         """
         Alters stated pdf version
         """
-        mutated = self
-        mutated[7] = random.randint(0, 9)
-        return mutated
+        return self._seed[:7] + b'%d' % random.randint(0, 9) + self._seed[8:]
 
 #Generic
     def _mutate_pdf_bytes(self):
         """
         Mutates pdf bytes randomly
         """
-        mutated_content = self._alter_random_byte(mutated_content)
+        mutated_content = self._alter_random_byte(self._seed)
         return mutated_content
     
     def _mutate_pdf_delete_bytes(self):
         """
         Deletes pdf bytes randomly
         """
-        mutated_content = self._delete_byte(mutated_content)
+        mutated_content = self._delete_byte(self._seed)
         return mutated_content
     
     def _mutate_pdf_insert_bytes(self):
         """
         Inserts random bytes into PDF
         """
+        mutated_content = self._seed
         for i in range(100):
             mutated_content = self._insert_multiple_bytes(mutated_content, i)
         return mutated_content
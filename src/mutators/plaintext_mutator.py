@@ -1,6 +1,5 @@
-from copy import deepcopy
-
-from .mutator_base import MutatorBase
+from .chunks import Chunks
+from .mutator_base import MutatorBase, deterministic
 import random
 
 
@@ -25,70 +24,106 @@ class PLAINTEXT_Mutator(MutatorBase):
         self.numLines = len(lines)
         self.badBytes = self.getBadBytes()
 
+    def _pad(self, padding: bytes, skip_first: bool = False):
+        """
+        Every line (but the first, with `skip_first`) with `padding`
+        appended, streamed as chunks rather than built in memory.
+        """
+        content = self._content
+        padded = len(content) - 1 if skip_first and content else len(content)
+        length = sum(map(len, content)) + padded * len(padding) + max(0, len(content) - 1)
+
+        def chunks():
+            for i, item in enumerate(content):
+                if i:
+                    yield b'\n'
+                yield item
+                if i or not skip_first:
+                    yield padding
+
+        return Chunks(chunks, length)
+
     # Append character padding
+    @deterministic
     def _mutate_add_chars1(self):
-        return [item + b'A' * 5000 for item in self._content]
+        return self._pad(b'A' * 5000)
 
+    @deterministic
     def _mutate_add_chars2(self):
         # start from the second character
-        return [self._content[0]] + [item + b'B' * 5000 for item in self._content[1:]]
+        return self._pad(b'B' * 5000, skip_first=True)
         
     # Append null characters
+    @deterministic
     def _mutate_nulls1(self):
-        return [item + b'0' * 5000 for item in self._content]
+        return self._pad(b'0' * 5000)
 
+    @deterministic
     def _mutate_nulls2(self):
-        return [self._content[0]] + [item + b'0' * 5000 for item in self._content[1:]]
+        return self._pad(b'0' * 5000, skip_first=True)
 
     # Append newlines
+    @deterministic
     def _mutate_newlines1(self):
-        return [item + b'\n' * 5000 for item in self._content]
+        return self._pad(b'\n' * 5000)
 
+    @deterministic
     def _mutate_newlines2(self):
-        return [self._content[0]] + [item + b'\n' * 5000 for item in self._content[1:]] 
+        return self._pad(b'\n' * 5000, skip_first=True)
 
     # Append format string
+    @deterministic
     def _mutate_format_string1(self):
-        return [item + b'%s' * 5000 for item in self._content] 
+        return self._pad(b'%s' * 5000)
 
+    @deterministic
     def _mutate_format_string2(self):
-        return [self._content[0]] + [item + b'%s' * 5000 for item in self._content[1:]]
+        return self._pad(b'%s' * 5000, skip_first=True)
  
 
     # Append ascii characters
+    @deterministic
     def _mutate_ascii1(self):
-        return [item + b''.join(bytes(chr(count), encoding="utf-8") for count in range(128)) for item in self._content]
+        return self._pad(bytes(range(128)))
 
+    @deterministic
     def _mutate_ascii2(self):
-        ascii_bytes = [bytes(chr(count), encoding="utf-8") for count in range(128)]
-        return [self._content[0]] + [item + b''.join(ascii_bytes) for item in self._content[1:]]
+        return self._pad(bytes(range(128)), skip_first=True)
 
     # Change seed to a large negative number
+    @deterministic
     def _mutate_large_negNum1(self):
         return [b'-99999999' for _ in self._content]
 
+    @deterministic
     def _mutate_large_negNum2(self):
         return [self._content[0]] + [b'-99999999' for _ in self._content[1:]]
 
     # same as negNum1 but with positive num
+    @deterministic
     def _mutate_large_num1(self):
         return [b'99999999' for _ in self._content]
 
+    @deterministic
     def _mutate_large_num2(self):
         return [self._content[0]] + [b'99999999' for _ in self._content[1:]]
 
     # # mutate into zero
+    @deterministic
     def _mutate_zero1(self):
         return [b'0' for _ in self._content]
 
+    @deterministic
     def _mutate_zero2(self):
         return [self._content[0]] + [b'0' for _ in self._content[1:]]
 
+    @deterministic
     def _mutate_null(self):
         return [b'\0' for _ in self._content] 
 
+    @deterministic
     def _mutate_test(self):
-        return [item + b'\x04' for item in self._content] 
+        return self._pad(b'\x04')
 
     # helper function
     def getBadBytes(self):
@@ -98,7 +133,7 @@ class PLAINTEXT_Mutator(MutatorBase):
 
     # mutate a random byte in a list of string
     def _mutate_randomChar(self):
-        content = deepcopy(self._content)
+        content = list(self._content)
         if content:
             pickLine = random.randint(0, len(content) - 1)
             if content[pickLine]:
@@ -113,11 +148,15 @@ class PLAINTEXT_Mutator(MutatorBase):
 
 
     def format_output(self, raw):
-        # Construct the plaintext file body by joining rows with newline
-        all_bytes = b'\n'.join(raw)
-
         # Generate a random non-null byte
         random_byte = random.randint(0x1, 0xff).to_bytes(1, 'little')
 
+        # Padded lines are streamed, only the null bytes need replacing
+        if isinstance(raw, Chunks):
+            return raw.replace(b'\x00', random_byte)
+
+        # Construct the plaintext file body by joining rows with newline
+        all_bytes = b'\n'.join(raw)
+
         # Replace null bytes with the random non-null byte
-        return all_bytes.replace(b'\x00', random_byte) 
\ No newline at end of file
+        return all_bytes.replace(b'\x00', random_byte) 
@@ -0,0 +1,84 @@
+import math
+import random
+
+
+class UniformScheduler:
+    """
+    Picks mutate methods uniformly at random and ignores feedback.
+
+    Schedulers pick the index of the next mutate method with `choose`,
+    learn from `reward(idx, value)` with values in [0, 1], and report what
+    they learned per method with `weights`.
+    """
+
+    def __init__(self, n_arms: int):
+        self._n = n_arms
+        self._plays = [0] * n_arms
+        self._rewards = [0.0] * n_arms
+
+    def choose(self) -> int:
+        return random.randrange(self._n)
+
+    def reward(self, idx: int, value: float):
+        self._plays[idx] += 1
+        self._rewards[idx] += value
+
+    def _weight(self, idx: int) -> float:
+        return 1 / self._n
+
+    def weights(self) -> list:
+        """Per method: (times rewarded, total reward, learned weight)."""
+        return [(self._plays[i], self._rewards[i], self._weight(i)) for i in range(self._n)]
+
+
+class UCBScheduler(UniformScheduler):
+    """
+    UCB1 bandit: plays every method once, then the one with the best mean
+    reward plus an exploration bonus that shrinks as it gets played.
+    """
+
+    def __init__(self, n_arms: int, exploration: float = math.sqrt(2)):
+        super().__init__(n_arms)
+        self._c = exploration
+        self._total = 0
+
+    def choose(self) -> int:
+        plays = self._plays
+        if 0 in plays:
+            return random.choice([i for i, p in enumerate(plays) if not p])
+        log_total = math.log(self._total)
+        rewards = self._rewards
+        c = self._c
+        return max(range(self._n),
+                   key=lambda i: rewards[i] / plays[i] + c * math.sqrt(log_total / plays[i]))
+
+    def reward(self, idx: int, value: float):
+        super().reward(idx, value)
+        self._total += 1
+
+    def _weight(self, idx: int) -> float:
+        return self._rewards[idx] / self._plays[idx] if self._plays[idx] else 0.0
+
+
+class ThompsonScheduler(UniformScheduler):
+    """
+    Thompson sampling over a Beta(1 + reward, 1 + misses) posterior per
+    method: samples every posterior and plays the best draw.
+    """
+
+    def choose(self) -> int:
+        plays = self._plays
+        rewards = self._rewards
+        betavariate = random.betavariate
+        return max(range(self._n),
+                   key=lambda i: betavariate(1 + rewards[i], 1 + plays[i] - rewards[i]))
+
+    def _weight(self, idx: int) -> float:
+        return (1 + self._rewards[idx]) / (2 + self._plays[idx])
+
+
+SCHEDULERS = {
+    "uniform": UniformScheduler,
+    "ucb": UCBScheduler,
+    "thompson": ThompsonScheduler,
+}
@@ -1,48 +1,112 @@
 import xml.etree.ElementTree as ET
+import itertools
 import random
-from .mutator_base import MutatorBase
+import re
+from .chunks import Chunks, repeated
+from .mutator_base import MutatorBase, deterministic
+
+_TAG = re.compile(rb'<(/?)([^\s/>]+)([^>]*?)(/?)>')
+_ATTRIBUTE = re.compile(rb'\s([^\s=]+)="([^"]*)"')
+
+# Maps random bytes onto a-z, for generating tag names a whole batch at a time.
+_ALPHABET = bytes(ord('a') + i % 26 for i in range(256))
+
+_FORGED_ELEMENTS = b'<h1 id="' + b'%s' * 10 + b'" />'
+_FORGED_ELEMENTS *= 0xff
 
 
 class XML_Mutator(MutatorBase):
+    """
+    The seed is serialized once the way ElementTree writes it, and every
+    element's tag name spans and attribute value spans in the result are
+    indexed. Mutations splice new bytes into those spans instead of editing
+    the tree, so the tree never needs restoring and untouched parts of the
+    document are copied as they are rather than re-serialized.
+    """
 
     def __init__(self, seed):
         super().__init__()
         self._content = ET.ElementTree(ET.fromstring(seed))
         self._seed = seed
+        self._doc = ET.tostring(self.root, method='xml')
+        self._index()
+
+    def _index(self):
+        """
+        Record, for every element in document order, the span of its name
+        in the start tag and in the end tag (None for an empty element),
+        the spans of its href values, and every name span in document order
+        with the index of the element it names.
+        """
+        self._elements = []
+        self._names = []
+        self._hrefs = []
+        open_elements = []
+        for match in _TAG.finditer(self._doc):
+            if match.group(1):
+                element = open_elements.pop()
+                element[1] = match.span(2)
+                self._names.append((*match.span(2), element[3]))
+                continue
+            element = [match.span(2), None, match, len(self._elements)]
+            self._elements.append(element)
+            self._names.append((*match.span(2), element[3]))
+            attributes = match.group(3)
+            for attribute in _ATTRIBUTE.finditer(attributes):
+                if attribute.group(1) == b'href':
+                    start = match.start(3) + attribute.start(2)
+                    self._hrefs.append((start, start + len(attribute.group(2))))
+            if not match.group(4):
+                open_elements.append(element)
+
+    def _splice(self, edits) -> bytes:
+        """The serialized seed with each (start, end, data) in `edits`, in order, applied."""
+        doc = self._doc
+        parts = []
+        prev = 0
+        for start, end, data in edits:
+            parts.append(doc[prev:start])
+            parts.append(data)
+            prev = end
+        parts.append(doc[prev:])
+        return b''.join(parts)
 
     def format_output(self, data):
-        if not data:
-            data = ET.tostring(self._content.getroot(), method='xml')
-            self._content = ET.ElementTree(ET.fromstring(self._seed))
+        """Methods already return in byte format"""
         return data
 
-    def _mutate_make_longer_tag(self):
-        for node in self._content.iter():
-            node.tag = self.pick_from_alphabet(0xff)
+    def _mutate_havoc(self):
+        return self._havoc(self._seed)
 
-    def _recusive_apply(self, node: ET.Element, fn):
-        fn(node)
-        for child in node:
-            self._recusive_apply(child, fn)
+    def _mutate_make_longer_tag(self):
+        names = random.randbytes(0xff * len(self._elements)).translate(_ALPHABET)
+        return self._splice((start, end, names[i * 0xff:(i + 1) * 0xff])
+                            for start, end, i in self._names)
 
+    @deterministic
     def _mutate_forge_attributes(self):
-        new_elements = [ET.Element("h1", {"id": "%s" * 10}) for _ in range(0xff)]
-        for element in new_elements:
-            self.root.append(element)
+        _, end_name, match, _ = self._elements[0]
+        if end_name is not None:
+            return self._splice([(end_name[0] - 2, end_name[0] - 2, _FORGED_ELEMENTS)])
+        # an empty root element has to be opened up first
+        tag = match.group(2)
+        return self._splice([(match.end() - 3, match.end(),
+                              b'>' + _FORGED_ELEMENTS + b'</' + tag + b'>')])
 
+    @deterministic
     def _mutate_recursion_overflow(self):
-        opening_tags = b'<fuz>' * 0xffff
-        closing_tags = b'</fuz>' * 0xffff
-        return opening_tags + closing_tags
+        opening_tags = repeated(b'<fuz>', 0xffff)
+        closing_tags = repeated(b'</fuz>', 0xffff)
+        return Chunks(lambda: itertools.chain(opening_tags, closing_tags),
+                      len(opening_tags) + len(closing_tags))
 
+    @deterministic
     def _mutate_alter_href(self):
-        for node in self._content.iter():
-            if 'href' in node.attrib:
-                node.set("href", "%s" * 10)
+        return self._splice([(start, end, b'%s' * 10) for start, end in self._hrefs])
 
     @property
     def root(self):
         return self._content.getroot()
 
     def pick_from_alphabet(self, length):
-        return ''.join(random.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(length))
+        return random.randbytes(length).translate(_ALPHABET).decode()
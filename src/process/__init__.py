@@ -1,2 +1,6 @@
-from process.file_types import whichType
+from process.file_types import whichType, sniff
 from process.exit import ExitCodes
+from process.forkserver import ForkServer
+from process.timeouts import AdaptiveTimeout
+from process.capture import CAPTURES, FullCapture, BoundedCapture, HashCapture, DiscardCapture
+from process import pipes
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import subprocess
+
+
+class _Buffer:
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data: bytes):
+        self._parts.append(data)
+
+    def getvalue(self) -> bytes:
+        return b''.join(self._parts)
+
+
+class _HeadTail:
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._head = bytearray()
+        self._tail = bytearray()
+
+    def write(self, data: bytes):
+        room = self._limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail += data[-self._limit:]
+            del self._tail[:-self._limit]  # cheap, bytearray drops from the front in place
+
+    def getvalue(self) -> bytes:
+        return bytes(self._head + self._tail)
+
+
+class _Hash:
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def write(self, data: bytes):
+        self._hash.update(data)
+
+    def getvalue(self) -> bytes:
+        return self._hash.digest()
+
+
+class FullCapture:
+    """
+    Keep everything a target writes to a stream. The other policies cap
+    what one exec can cost in memory and copying; all of them have a
+    `stream` to hand to Popen, a fresh `sink()` to write the output to as
+    it arrives, and `read_file` for output that went to a file.
+    """
+
+    stream = subprocess.PIPE
+    incremental = False  # whether the sink does better than keeping everything
+
+    def __init__(self, limit: int = None):
+        self.limit = limit
+
+    def sink(self):
+        return _Buffer()
+
+    def read_file(self, fp) -> bytes:
+        fp.seek(0)
+        return fp.read()
+
+
+class BoundedCapture(FullCapture):
+    """Keep only the first and the last `limit` bytes, so at most 2 * `limit`."""
+
+    incremental = True
+
+    def __init__(self, limit: int = 1 << 16):
+        super().__init__(limit)
+
+    def sink(self):
+        return _HeadTail(self.limit)
+
+    def read_file(self, fp) -> bytes:
+        size = os.fstat(fp.fileno()).st_size
+        fp.seek(0)
+        if size <= 2 * self.limit:
+            return fp.read()
+        head = fp.read(self.limit)
+        fp.seek(size - self.limit)
+        return head + fp.read(self.limit)
+
+
+class HashCapture(FullCapture):
+    """Keep a 16-byte BLAKE2 digest of the output, computed as it streams in."""
+
+    incremental = True
+
+    def sink(self):
+        return _Hash()
+
+    def read_file(self, fp) -> bytes:
+        sink = _Hash()
+        fp.seek(0)
+        while data := fp.read(1 << 16):
+            sink.write(data)
+        return sink.getvalue()
+
+
+class DiscardCapture(FullCapture):
+    """Send the output to /dev/null; it always reads back as b''."""
+
+    stream = subprocess.DEVNULL
+
+    def sink(self):
+        return None
+
+    def read_file(self, fp) -> bytes:
+        return b''
+
+
+CAPTURES = {
+    "full": FullCapture,
+    "bounded": BoundedCapture,
+    "hash": HashCapture,
+    "discard": DiscardCapture,
+}
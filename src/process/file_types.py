@@ -1,51 +1,157 @@
 import csv
-from io import BytesIO
+import hashlib
 import json
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import List, Tuple
 
+# Structural checks only look at this much of a seed.
+SNIFF_PREFIX = 1 << 16
 
-def isCSV(input_raw: bytes) -> bool:
+_CACHE_SIZE = 256
+_cache = OrderedDict()
+
+MAGIC = (
+    ("jpeg", b'\xff\xd8\xff'),
+    ("pdf", b'%PDF-'),
+)
+
+
+def _text(sample: bytes, complete: bool):
+    """`sample` decoded as UTF-8, less a character the cut split, or None."""
+    try:
+        return sample.decode()
+    except UnicodeDecodeError as e:
+        if complete or e.start < len(sample) - 3:
+            return None
+        return sample[:e.start].decode()
+
+
+def _csv_confidence(sample: bytes, complete: bool) -> float:
     """
-    Determine if the given bytes represent a valid CSV format with
-    at least two columns and more than one line.
+    At least two columns and a second line of the same width, as before;
+    the more of the other lines agree on the width the surer it is.
     """
-    
-    sample_file = BytesIO(input_raw)
+    if not complete:
+        sample = sample[:sample.rfind(b'\n') + 1]  # drop the cut-off line
+    text = _text(sample, True)
+    if text is None:
+        return 0.0
+    try:
+        rows = list(csv.reader(text.splitlines()))
+    except csv.Error:
+        return 0.0
+    if len(rows) < 2 or len(rows[0]) < 2 or len(rows[1]) != len(rows[0]):
+        return 0.0
+    width = len(rows[0])
+    agree = sum(1 for row in rows if len(row) == width)
+    return 0.5 + 0.4 * agree / len(rows)
+
 
+def _json_confidence(sample: bytes, complete: bool) -> float:
+    """
+    A list or an object. A cut-off sample counts if the parser gets to
+    within a token (a literal or a \\uXXXX escape) of the cut, or stops
+    inside a string running into it.
+    """
+    if sample.lstrip()[:1] not in (b'{', b'['):
+        return 0.0
+    text = _text(sample, complete)
+    if text is None:
+        return 0.0
     try:
-        reader = csv.reader(sample_file.read().decode().splitlines())
-        header = next(reader)
-        if len(header) < 2:
-            return False
-        
-        next_line = next(reader)  
-        if len(next_line) != len(header): 
-            return False
+        json.loads(text)
+        return 1.0
+    except json.JSONDecodeError as e:
+        if complete:
+            return 0.0
+        prefix_ok = e.pos >= len(e.doc) - 6 or e.msg.startswith("Unterminated string")
+        return 0.8 if prefix_ok else 0.0
+    except (ValueError, RecursionError):  # nested too deep for the parser
+        return 0.0
+
+
+def _xml_confidence(sample: bytes, complete: bool) -> float:
+    """Well-formed XML; for a cut-off sample, well-formed as far as it goes."""
+    if sample.lstrip()[:1] != b'<':
+        return 0.0
+    parser = ET.XMLPullParser()
+    try:
+        parser.feed(sample)
+        if not complete:
+            return 0.8
+        parser.close()
+        return 1.0
+    except ET.ParseError:
+        return 0.0
 
-    except:  
-        return False
 
+STRUCTURED = (
+    ("csv", _csv_confidence),
+    ("json", _json_confidence),
+    ("xml", _xml_confidence),
+)
+
+
+def sniff(input: bytes) -> List[Tuple[str, float]]:
+    """
+    Every file type `input` could be, with a confidence from 0 to 1, most
+    likely first.
+
+    Magic bytes are checked first and settle the type on their own. Other
+    types are checked on the first `SNIFF_PREFIX` bytes only, so the cost
+    doesn't grow with the seed; a seed cut short that way is never rated
+    quite as high as one checked in full. Anything that isn't clearly some
+    type is also plaintext. Results are cached by a hash of all the
+    content they depend on: the prefix, whether that is the whole seed,
+    and the last two bytes.
+    """
+    complete = len(input) <= SNIFF_PREFIX
+    sample = input[:SNIFF_PREFIX]
+    key = hashlib.blake2b(b''.join((sample, input[-2:], b'%d' % complete)), digest_size=16).digest()
+    if key in _cache:
+        _cache.move_to_end(key)
+        return list(_cache[key])
+
+    ranked = []
+    for filetype, magic in MAGIC:
+        if input.startswith(magic):
+            ranked.append((filetype, 1.0 if filetype != "jpeg" or input.endswith(b'\xff\xd9') else 0.8))
+            break
+    else:
+        for filetype, confidence in STRUCTURED:
+            score = confidence(sample, complete)
+            if score > 0:
+                ranked.append((filetype, score))
+        ranked.sort(key=lambda entry: entry[1], reverse=True)  # stable, so ties keep this order
+    best = ranked[0][1] if ranked else 0.0
+    if best < 1.0:
+        ranked.append(("plaintext", 1.0 - best))
+
+    _cache[key] = tuple(ranked)
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return ranked
+
+
+def isCSV(input_raw: bytes) -> bool:
+    """
+    Determine if the given bytes represent a valid CSV format with
+    at least two columns and more than one line.
+    """
+    return _csv_confidence(input_raw[:SNIFF_PREFIX], len(input_raw) <= SNIFF_PREFIX) > 0
 
-    return True
 
 def isJSON(input_raw: bytes) -> bool:
     """
-    Determine if the given bytes represent a valid JSON format 
+    Determine if the given bytes represent a valid JSON format
     which is either a list or an object.
     """
-    
-    try:
-        # Attempt to decode the bytes into a Python object
-        parsed = json.loads(input_raw)
-        return isinstance(parsed, (list, dict))
-    except:
-        return False
+    return _json_confidence(input_raw[:SNIFF_PREFIX], len(input_raw) <= SNIFF_PREFIX) > 0
 
 
 def isPDF(input_raw: bytes) -> bool:
-    if input_raw.startswith("25504446"):
-        return True
-    return False    
+    return input_raw.startswith(b'%PDF-')
 
 
 def isJPEG(input_raw: bytes) -> bool:
@@ -56,7 +162,7 @@ def isJPEG(input_raw: bytes) -> bool:
     EOI = b'\xff\xd9'
     if input_raw.startswith(SOI) and input_raw.endswith(EOI):
         return True
-    
+
     return False
 
 
@@ -67,31 +173,12 @@ def isXML(input_raw: bytes) -> bool:
     :param data: bytes to check.
     :return: True if data is an XML file, False otherwise.
     """
-    try:
-        ET.fromstring(input_raw)
-        return True
-    except ET.ParseError:
-        return False
-    except Exception as e:
-        # Handle other potential exceptions, e.g., encoding issues
-        print(f"An error occurred: {e}")
-        return False
+    return _xml_confidence(input_raw[:SNIFF_PREFIX], len(input_raw) <= SNIFF_PREFIX) > 0
 
 
 def whichType(input):
     """
-    Infer the file type of a given sample based on a series of matching functions.
-    """
-    
-    def checkers():
-        yield ("csv", isCSV)
-        yield ("json", isJSON)
-        # for later implementation
-        yield ("xml", isXML)
-        yield ("jpeg", isJPEG)
-        # yield ("xml", xml_checker)
-        # yield ("elf", elf_checker)
-        yield ("pdf", isPDF)
-        
-    # default value set to 'plaintext' because all seeds end with '.txt'
-    return next((filetype for filetype, matcher in checkers() if matcher(input)), 'plaintext')
+    Infer the file type of a given sample: the most likely one `sniff`
+    finds, 'plaintext' when nothing fits.
+    """
+    return sniff(input)[0][0]
@@ -0,0 +1,70 @@
+/*
+ * Fork-server shim, loaded into the target with LD_PRELOAD.
+ *
+ * The constructor runs before main(). When FUZZ_FORKSRV_CTL and
+ * FUZZ_FORKSRV_ST name the control/status pipe fds, the process becomes a
+ * fork server instead of running main() itself:
+ *
+ *   - write 4 bytes to the status pipe to say hello
+ *   - for every 4 bytes read from the control pipe, rewind stdin and fork;
+ *     the child returns from the constructor and runs main() as usual,
+ *     the parent reports the child's pid and then its wait status
+ *
+ * Without those variables the shim does nothing.
+ */
+#include <stdlib.h>
+#include <stdint.h>
+#include <unistd.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+
+static int read_all(int fd, void *buf, size_t len)
+{
+    return read(fd, buf, len) == (ssize_t)len;
+}
+
+static int write_all(int fd, const void *buf, size_t len)
+{
+    return write(fd, buf, len) == (ssize_t)len;
+}
+
+__attribute__((constructor))
+static void fuzz_forkserver(void)
+{
+    const char *ctl_env = getenv("FUZZ_FORKSRV_CTL");
+    const char *st_env = getenv("FUZZ_FORKSRV_ST");
+    if (!ctl_env || !st_env)
+        return;
+
+    int ctl = atoi(ctl_env);
+    int st = atoi(st_env);
+    int32_t msg = 0;
+
+    if (!write_all(st, &msg, sizeof(msg)))
+        return;
+
+    while (read_all(ctl, &msg, sizeof(msg))) {
+        lseek(STDIN_FILENO, 0, SEEK_SET);
+
+        pid_t child = fork();
+        if (child < 0)
+            _exit(1);
+        if (child == 0) {
+            close(ctl);
+            close(st);
+            return;
+        }
+
+        int32_t pid = child;
+        if (!write_all(st, &pid, sizeof(pid)))
+            _exit(1);
+
+        int status = 0;
+        if (waitpid(child, &status, 0) < 0)
+            _exit(1);
+        int32_t wstatus = status;
+        if (!write_all(st, &wstatus, sizeof(wstatus)))
+            _exit(1);
+    }
+    _exit(0);
+}
@@ -0,0 +1,162 @@
+import fcntl
+import os
+import select
+import signal
+import struct
+import subprocess
+import tempfile
+from typing import Tuple
+
+from process.capture import FullCapture
+
+_SHIM_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forkserver.c")
+
+
+def _elf_class(binary: str) -> int:
+    """Return 32 or 64 depending on the ELF class of `binary`."""
+    with open(binary, 'rb') as f:
+        ident = f.read(5)
+    return 32 if ident[4:5] == b'\x01' else 64
+
+
+def build_shim(binary: str) -> str:
+    """
+    Compile the fork-server shim for the word size of `binary`, if it
+    isn't already built, and return the path of the shared object.
+
+    Raises:
+        OSError: the compiler is missing or the build failed.
+    """
+    bits = _elf_class(binary)
+    shim = os.path.join(os.path.dirname(_SHIM_SOURCE), f"forkserver{bits}.so")
+    if os.path.exists(shim) and os.path.getmtime(shim) >= os.path.getmtime(_SHIM_SOURCE):
+        return shim
+
+    cmd = [os.environ.get("CC", "cc"), f"-m{bits}", "-O2", "-shared", "-fPIC",
+           "-o", shim, _SHIM_SOURCE]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise OSError(f"Couldn't build fork-server shim: {e.stderr.decode(errors='replace')}")
+    return shim
+
+
+class ForkServer:
+    """
+    Drives a target that was started with the fork-server shim preloaded.
+
+    The target is exec'd once. Every test case is written to a scratch file
+    that backs the server's stdin, and the server forks a fresh child that
+    starts straight at main(), skipping execve and dynamic linking.
+    stdout and stderr go to append-mode scratch files so they can be
+    truncated between runs, and are read back as the `capture` and
+    `capture_err` policies say (a discarded stream goes to /dev/null).
+    """
+
+    def __init__(self, binary: str, startup_timeout: float = 2.0,
+                 capture: FullCapture = None, capture_err: FullCapture = None):
+        shim = build_shim(binary)
+
+        self._capture = capture or FullCapture()
+        self._capture_err = capture_err or FullCapture()
+        self._stdin = tempfile.TemporaryFile()
+        self._stdout = self._scratch(self._capture)
+        self._stderr = self._scratch(self._capture_err)
+
+        ctl_r, self._ctl = os.pipe()
+        self._status, st_w = os.pipe()
+
+        env = dict(os.environ)
+        env["LD_PRELOAD"] = shim
+        env["FUZZ_FORKSRV_CTL"] = str(ctl_r)
+        env["FUZZ_FORKSRV_ST"] = str(st_w)
+
+        self._server = subprocess.Popen(
+            binary,
+            stdin=self._stdin,
+            stdout=self._stdout or subprocess.DEVNULL,
+            stderr=self._stderr or subprocess.DEVNULL,
+            pass_fds=(ctl_r, st_w),
+            env=env
+        )
+        os.close(ctl_r)
+        os.close(st_w)
+
+        if self._read_status(startup_timeout) is None:
+            self.close()
+            raise OSError(f"{binary} did not start the fork server")
+
+    @staticmethod
+    def _scratch(capture: FullCapture):
+        """An append-only scratch file for a captured stream, None if it's discarded."""
+        if capture.stream == subprocess.DEVNULL:
+            return None
+        fp = tempfile.TemporaryFile()
+        flags = fcntl.fcntl(fp.fileno(), fcntl.F_GETFL)
+        fcntl.fcntl(fp.fileno(), fcntl.F_SETFL, flags | os.O_APPEND)
+        return fp
+
+    def _read_status(self, timeout: float):
+        ready, _, _ = select.select([self._status], [], [], timeout)
+        if not ready:
+            return None
+        data = os.read(self._status, 4)
+        if len(data) != 4:
+            raise OSError("fork server exited")
+        return struct.unpack('i', data)[0]
+
+    @staticmethod
+    def _reset_file(fp, content=b''):
+        fp.seek(0)
+        fp.truncate()
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            fp.write(content)
+        else:
+            fp.writelines(content)  # an iterable of chunks
+        fp.flush()
+
+    def run(self, input_bytes: bytes, timeout: float = 0.5) -> Tuple[bytes, bytes, int]:
+        """
+        Run one test case, with the same result and exit code conventions
+        as `Popen.communicate` plus `Popen.returncode`. `input_bytes` may
+        also be an iterable of byte chunks.
+
+        Raises:
+            subprocess.TimeoutExpired: the child didn't exit within `timeout`.
+                It has been killed and reaped by the time this is raised.
+        """
+        self._reset_file(self._stdin, input_bytes)
+        for fp in (self._stdout, self._stderr):
+            if fp is not None:
+                self._reset_file(fp)
+
+        os.write(self._ctl, b'\0\0\0\0')
+        pid = self._read_status(timeout)
+        if pid is None:
+            raise OSError("fork server stopped responding")
+        status = self._read_status(timeout)
+        if status is None:
+            os.kill(pid, signal.SIGKILL)
+            self._read_status(None)
+            raise subprocess.TimeoutExpired("forkserver", timeout)
+
+        if os.WIFSIGNALED(status):
+            exitcode = -os.WTERMSIG(status)
+        else:
+            exitcode = os.WEXITSTATUS(status)
+        outs = self._capture.read_file(self._stdout) if self._stdout else b''
+        err = self._capture_err.read_file(self._stderr) if self._stderr else b''
+        return outs, err, exitcode
+
+    def close(self):
+        for fd in (self._ctl, self._status):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self._server.poll() is None:
+            self._server.kill()
+        self._server.wait()
+        for fp in (self._stdin, self._stdout, self._stderr):
+            if fp is not None:
+                fp.close()
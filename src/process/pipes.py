@@ -0,0 +1,170 @@
+import os
+import selectors
+import subprocess
+import time
+from collections import deque
+from itertools import islice
+from typing import Tuple
+
+from process.capture import FullCapture
+
+_FULL = FullCapture()
+
+# Most chunk bytes queued for stdin at once, and iovecs per writev call.
+WRITE_BUFFER = 1 << 16
+_IOV_MAX = 1024
+
+_BYTES_LIKE = (bytes, bytearray, memoryview)
+
+
+def communicate(proc: subprocess.Popen, input, timeout: float = None,
+                capture: FullCapture = _FULL, capture_err: FullCapture = _FULL) -> Tuple[bytes, bytes]:
+    """
+    `proc.communicate(input, timeout)` that also accepts an iterable of
+    byte chunks for `input`, and keeps stdout and stderr as the `capture`
+    and `capture_err` policies say. Chunks are pulled only while less than
+    `WRITE_BUFFER` bytes are waiting for the target and are written with
+    writev, so the target starts reading before the input is complete and
+    the whole input is never in memory at once. Output is fed to the
+    policies' sinks as it arrives. Streams that aren't pipes read as b''.
+
+    Raises:
+        subprocess.TimeoutExpired: the target is still running after
+            `timeout`. Clean up with `kill`.
+    """
+    if isinstance(input, _BYTES_LIKE):
+        if not (capture.incremental or capture_err.incremental):
+            outs, err = proc.communicate(input, timeout=timeout)
+            return outs or b'', err or b''
+        input = (input,)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    chunks = iter(input)
+    pending = deque()
+    buffered = 0
+    stdin = proc.stdin.fileno()
+    os.set_blocking(stdin, False)
+    sinks = [policy.sink() if pipe is not None else None
+             for pipe, policy in ((proc.stdout, capture), (proc.stderr, capture_err))]
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(stdin, selectors.EVENT_WRITE)
+        for pipe, sink in zip((proc.stdout, proc.stderr), sinks):
+            if pipe is not None:
+                selector.register(pipe, selectors.EVENT_READ, sink)
+        while selector.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(proc.args, timeout)
+            for key, _ in selector.select(remaining):
+                if key.fileobj != stdin:
+                    data = os.read(key.fd, 32768)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                    elif key.data is not None:
+                        key.data.write(data)
+                    continue
+
+                while chunks is not None and buffered < WRITE_BUFFER:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        chunks = None
+                    elif chunk:
+                        pending.append(memoryview(chunk))
+                        buffered += len(chunk)
+                try:
+                    written = os.writev(stdin, list(islice(pending, _IOV_MAX))) if pending else 0
+                except BlockingIOError:
+                    continue
+                except BrokenPipeError:  # the target stopped reading, drop the rest
+                    pending.clear()
+                    chunks = None
+                    written = buffered
+                buffered -= written
+                while written and pending:
+                    if written >= len(pending[0]):
+                        written -= len(pending.popleft())
+                    else:
+                        pending[0] = pending[0][written:]
+                        written = 0
+                if not pending and chunks is None:
+                    selector.unregister(stdin)
+                    proc.stdin.close()
+
+    remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+    proc.wait(timeout=remaining)
+    return tuple(sink.getvalue() if sink is not None else b'' for sink in sinks)
+
+
+def kill(proc: subprocess.Popen):
+    """Kill a target left running by a timed-out `communicate` and reap it."""
+    proc.kill()
+    for pipe in (proc.stdin, proc.stdout, proc.stderr):
+        if pipe is not None:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+    proc.wait()
+
+
+async def communicate_async(proc: "asyncio.subprocess.Process", input,
+                             capture: FullCapture = _FULL,
+                             capture_err: FullCapture = _FULL) -> Tuple[bytes, bytes]:
+    """
+    `communicate` for asyncio processes. Chunks are gathered into writes of
+    at least `WRITE_BUFFER` bytes, so a test case of many small chunks
+    doesn't wait on a drain for every one.
+    """
+    import asyncio  # only the --inflight engine needs it, and it is slow to import
+    if isinstance(input, _BYTES_LIKE):
+        if not (capture.incremental or capture_err.incremental):
+            outs, err = await proc.communicate(input)
+            return outs or b'', err or b''
+        input = (input,)
+
+    async def feed():
+        try:
+            batch, size = [], 0
+            for chunk in input:
+                batch.append(chunk)
+                size += len(chunk)
+                if size >= WRITE_BUFFER:
+                    proc.stdin.writelines(batch)
+                    batch, size = [], 0
+                    await proc.stdin.drain()
+            proc.stdin.writelines(batch)
+            await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            proc.stdin.close()
+
+    async def drain(stream, policy):
+        if stream is None:
+            return b''
+        sink = policy.sink()
+        while data := await stream.read(32768):
+            if sink is not None:
+                sink.write(data)
+        return sink.getvalue() if sink is not None else b''
+
+    _, outs, err = await asyncio.gather(feed(), drain(proc.stdout, capture),
+                                        drain(proc.stderr, capture_err))
+    await proc.wait()
+    return outs, err
+
+
+async def kill_async(proc: "asyncio.subprocess.Process"):
+    """
+    Kill an asyncio target left behind by a cancelled `communicate_async`
+    and reap it. Its output is drained first: asyncio only reports the exit
+    once every pipe has hit EOF, which a full, paused pipe never does.
+    """
+    import asyncio
+    if proc.returncode is None:
+        proc.kill()
+    await asyncio.gather(*(stream.read() for stream in (proc.stdout, proc.stderr)
+                           if stream is not None))
+    await proc.wait()
@@ -0,0 +1,81 @@
+from collections import deque
+from typing import Iterable
+
+
+class AdaptiveTimeout:
+    """
+    Per-target timeout derived from measured execution times.
+
+    The timeout is a multiple of a high percentile of recent execution
+    times, clamped to [min_timeout, max_timeout]. `calibrate` seeds it from
+    a handful of runs of the seed, `record` keeps it moving during the
+    campaign. A run that exceeds `timeout` should be retried once with
+    `retry_timeout` before it is reported as a hang. That is never less
+    than `max_timeout`: calibration only sees the seeds, so `timeout` can
+    sit at the floor while a big, healthy test case takes several times
+    longer.
+
+    Attributes:
+        timeout: current limit in seconds for a normal run.
+        retry_timeout: limit in seconds for confirming a suspected hang.
+    """
+
+    def __init__(self,
+                 initial: float = 0.5,
+                 min_timeout: float = 0.02,
+                 max_timeout: float = 2.0,
+                 percentile: float = 0.95,
+                 multiplier: float = 5.0,
+                 retry_factor: float = 4.0,
+                 window: int = 256,
+                 fixed: bool = False):
+        self.timeout = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._percentile = percentile
+        self._multiplier = multiplier
+        self._retry_factor = retry_factor
+        self._samples = deque(maxlen=window)
+        self._update_every = max(1, window // 4)
+        self._pending = 0
+        self._fixed = fixed
+
+    @classmethod
+    def fixed(cls, timeout: float) -> "AdaptiveTimeout":
+        """A timeout that ignores calibration and samples."""
+        return cls(initial=timeout, min_timeout=timeout, max_timeout=timeout,
+                   retry_factor=1.0, fixed=True)
+
+    @property
+    def retry_timeout(self) -> float:
+        return max(self.timeout * self._retry_factor, self.max_timeout)
+
+    @property
+    def needs_calibration(self) -> bool:
+        return not self._fixed
+
+    def calibrate(self, durations: Iterable[float]) -> float:
+        """Replace the samples with `durations` and derive a timeout from them."""
+        self._samples.clear()
+        self._samples.extend(durations)
+        self._update()
+        return self.timeout
+
+    def record(self, duration: float):
+        """Add one execution time, recomputing the timeout every few samples."""
+        if self._fixed:
+            return
+        self._samples.append(duration)
+        self._pending += 1
+        if self._pending >= self._update_every:
+            self._update()
+
+    def _update(self):
+        self._pending = 0
+        if self._fixed or not self._samples:
+            return
+        ordered = sorted(self._samples)
+        rank = min(len(ordered) - 1, int(len(ordered) * self._percentile))
+        derived = ordered[rank] * self._multiplier
+        self.timeout = min(self.max_timeout, max(self.min_timeout, derived))
+
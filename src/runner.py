@@ -1,23 +1,65 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import random
 import subprocess
 import sys
+import time
+import traceback
 from typing import Tuple, Iterator
 
+import harness
 import mutators
 import process
 
+STATS_EVERY = 256
+# Seconds the coordinator waits for a worker result before checking the workers are alive.
+WORKER_POLL = 1.0
+# Stage timings of the callers that don't keep any.
+_NO_STATS = harness.Stats(status_line=False)
+# Output kept by the callers that don't pass capture policies.
+_FULL_CAPTURE = (process.FullCapture(), process.FullCapture())
+
+
 class Manager:
 
-    _MUTATORS = {
-        "csv" : mutators.CSV_Mutator,
-        "json" : mutators.JSON_Mutator,
-        "plaintext": mutators.PLAINTEXT_Mutator,
-        "xml": mutators.XML_Mutator,
-        "jpeg" : mutators.JPEG_Mutator,
-        "pdf" : mutators.PDF_Mutator
-    }
-    
-    def __init__(self, binary, seed, times: int = 5000):
-        self._num_runs = times
+    def __init__(self, binary, seed, times: int = 5000, jobs: int = 1, inflight: int = 1,
+                 forkserver: bool = False, timeout: float = None,
+                 campaign: bool = False, duration: float = None, out_dir: str = ".",
+                 stats_path: str = None, log_path: str = None,
+                 verbosity: int = harness.NORMAL, scheduler: str = "uniform",
+                 feedback: bool = False, capture: str = "full", capture_limit: int = 1 << 16,
+                 dedup: bool = True, minimize: bool = True, bisect: bool = True):
+        self._num_runs = times or float('inf')
+        self._duration = duration
+        self._deadline = None
+        self._crash_store = harness.CrashStore(out_dir) if campaign else None
+        self._log = harness.ResultLog(log_path, verbosity)
+        interactive = sys.stderr.isatty() and verbosity >= harness.NORMAL
+        self._stats = harness.Stats(
+            stats_path,
+            status_line=interactive and verbosity < harness.VERBOSE,
+            summary_interval=None if interactive or verbosity < harness.NORMAL else 30.0
+        )
+        self._jobs = max(1, jobs)
+        self._inflight = max(1, inflight)
+        self._use_forkserver = forkserver
+        if forkserver and self._jobs == 1 and self._inflight > 1:
+            self._log.event("The fork server isn't used with --inflight, each input gets a fresh process")
+            self._use_forkserver = False
+        self._forkserver = None
+        self._timeout = process.AdaptiveTimeout.fixed(timeout) if timeout else process.AdaptiveTimeout()
+        # stdout as asked; stderr feeds crash bucketing, which only reads its tail
+        self._captures = (
+            process.CAPTURES[capture](capture_limit),
+            process.FullCapture() if capture == "full"
+            else process.BoundedCapture(max(capture_limit, harness.STDERR_TAIL)),
+        )
+        self._minimize = minimize
+        self._bisect = bisect
+        # (method, input, path in the crash store or None) of crashes to look into once fuzzing stops
+        self._follow_ups = []
         self._current_checkpoint = 0
         
         self._process_name = self._format_binary_path(binary)
@@ -25,16 +67,31 @@ class Manager:
         self._stop_flag = False
         
         try:
-            self._input_file = self._read_file(seed)
+            self._seeds = self._read_seeds(seed)
 
         except OSError:
             print(f"Couldn't open input file: {seed}")
             sys.exit()
 
+        if not self._seeds:
+            print(f"No seed files in: {seed}")
+            sys.exit()
 
-        self._file_type = process.whichType(self._input_file)
-        self._fuzz = self._MUTATORS[self._file_type](self._input_file)
-        self._init_process()
+        self._scheduler = mutators.SCHEDULERS[scheduler]
+        self._feedback = feedback
+        self._novelty = harness.NoveltyTracker() if feedback else None
+        self._fuzz = _build_fuzz(self._seeds, self._scheduler, feedback, self._log.event)
+        self._dedup = dedup
+        if dedup:
+            self._fuzz = harness.UniqueInputs(self._fuzz)
+        if self._inflight == 1:
+            # Each input is finished with before the next one is generated.
+            self._fuzz.use_buffer()
+        self._last_duration = 0.0
+        if self._jobs == 1 and self._inflight == 1:
+            if self._use_forkserver:
+                self._forkserver = self._start_forkserver(self._process_name, self._captures)
+            self._init_process()
 
     def _format_binary_path(self, binary: str) -> str:
         """Ensure the binary path is correctly formatted."""
@@ -46,68 +103,639 @@ class Manager:
         with open(file_path, 'rb') as f:
             return f.read()
 
+    @classmethod
+    def _read_seeds(cls, path: str) -> list:
+        """The seed in file `path`, or every file anywhere under directory `path`."""
+        if not os.path.isdir(path):
+            return [cls._read_file(path)]
+        return [cls._read_file(os.path.join(root, name))
+                for root, _, names in sorted(os.walk(path)) for name in sorted(names)]
+
     @staticmethod
-    def _read_file(file_path: str) -> bytes:
-        """Read and return content of a file."""
-        with open(file_path, 'rb') as f:
-            return f.read()
+    def _start_forkserver(process_name: str, captures):
+        """Start a fork server for the binary, or return None if it can't be used."""
+        try:
+            return process.ForkServer(process_name, capture=captures[0], capture_err=captures[1])
+        except OSError as e:
+            print(f"Fork server unavailable, falling back to exec per input: {e}")
+            return None
 
     def _init_process(self):
+        if self._forkserver is not None:
+            return  # the fork server stays up across test cases
+        start = time.perf_counter_ns()
         self._process = subprocess.Popen(
             self._process_name,
             stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stdout=self._captures[0].stream,
+            stderr=self._captures[1].stream
         )
+        self._stats.add_stage("spawn", time.perf_counter_ns() - start)
 
     def _reset(self):
         self._init_process()
 
-    def _log_result(self, idx: int, name: str, input_bytes: bytes, outs: bytes, err: bytes, exitcode: int):
-        """Print and log the result of the processing."""
-        status = 'PASSED' if exitcode >= 0 else 'CRASHED'
-        print(f"{idx+1} {status} | exitcode: {exitcode}")
-        print(f"\t{'method:':<12}{name}")
-        print(f"\t{'input_length:':<12}{len(input_bytes)}")
-        print("=" * 50)
+    def _log_result(self, idx: int, name: str, input_length: int, exitcode):
+        """Log the result of the processing."""
+        self._log.exec_result(idx, name, input_length, exitcode)
 
     def _result_dump(self, input):
         with open(f"{self._txt_name}_dump.txt", "wb") as fp:
             fp.write(input)
             fp.close()
     
-    def _process_input(self, input_bytes: bytes) -> Tuple[bytes, bytes, int]:
-        """Send input to the binary process and return output, error, and exit code."""
-        outs, err = self._process.communicate(input_bytes, timeout=0.5)
-        return outs, err, self._process.returncode
-    
+    def _process_input(self, input_bytes: bytes, timeout: float = None) -> Tuple[bytes, bytes, int]:
+        """
+        Send input to the binary process and return output, error, and exit code.
+        `input_bytes` may be bytes or `mutators.Chunks`, which are streamed.
+        The execution time of every completed run feeds the adaptive timeout.
+        """
+        timeout = timeout or self._timeout.timeout
+        start = time.perf_counter_ns()
+        if self._forkserver is not None:
+            result = self._forkserver.run(input_bytes, timeout=timeout)
+        else:
+            try:
+                outs, err = process.pipes.communicate(self._process, input_bytes, timeout,
+                                                      *self._captures)
+            except subprocess.TimeoutExpired:
+                killed = time.perf_counter_ns()
+                process.pipes.kill(self._process)
+                self._stats.add_stage("teardown", time.perf_counter_ns() - killed)
+                raise
+            result = outs, err, self._process.returncode
+        elapsed = time.perf_counter_ns() - start
+        self._stats.add_stage("communicate", elapsed)
+        self._last_duration = elapsed / 1e9
+        self._timeout.record(self._last_duration)
+        return result
+
+    def _confirm_hang(self, input_bytes: bytes):
+        """
+        Re-run an input that hit the timeout with the longer retry limit.
+        Returns the result if it completes this time, or None for a real hang.
+        """
+        self._reset()
+        try:
+            return self._process_input(input_bytes, self._timeout.retry_timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def _calibrate(self, runs: int = 8):
+        """
+        Run the seeds (the first `runs` of them, in turn) `runs` times under
+        the maximum timeout and derive the per-input timeout from the
+        measured execution times.
+        """
+        if not self._timeout.needs_calibration:
+            return
+        durations = []
+        for seed in itertools.islice(itertools.cycle(self._seeds[:runs]), runs):
+            start = time.perf_counter()
+            try:
+                _execute_once(self._process_name, self._forkserver, seed,
+                              self._timeout.max_timeout, captures=self._captures)
+            except subprocess.TimeoutExpired:
+                continue
+            durations.append(time.perf_counter() - start)
+        if durations:
+            self._timeout.calibrate(durations)
+        self._log.event(f"Calibrated timeout: {self._timeout.timeout * 1000:.1f}ms")
+
     def run(self):
         self._txt_name = self._process_name.split('/')[-1].split('.')[0]
+        self._calibrate()
+        if self._duration:
+            self._deadline = time.time() + self._duration
+        if self._jobs > 1:
+            return self._run_parallel()
+        if self._inflight > 1:
+            import asyncio  # only this engine needs it, and it is slow to import
+            return asyncio.run(self._run_async())
+
+        execs = 0
         for idx, (input_bytes, name) in enumerate(self._fuzz, 1):
-            if idx > self._num_runs:
+            if not self._budget_left(idx):
                 break
+            execs = idx
+            self._record_mutation(self._fuzz)
             try:
                 outs, err, exitcode = self._process_input(input_bytes)
-                self._log_result(idx, name, input_bytes, outs, err, exitcode)
+            except subprocess.TimeoutExpired:
+                result = self._confirm_hang(input_bytes)
+                outs, err, exitcode = result if result is not None else (b'', b'', None)
+
+            duration = self._last_duration if exitcode is not None else self._timeout.retry_timeout
+            novel = _observe(self._novelty, self._fuzz, input_bytes, exitcode, outs, err, duration)
+            if self._handle_result(idx, name, len(input_bytes), exitcode, input_bytes, err, novel,
+                                   duration):
+                break
+            self._reset()
+
+        if self._forkserver is not None:
+            self._forkserver.close()
+        self._report_summary(execs)
+
+    def _record_mutation(self, fuzz):
+        mutate_ns, format_ns = fuzz.last_timings
+        self._stats.add_stage("mutate", mutate_ns)
+        self._stats.add_stage("format", format_ns)
+        if self._dedup:
+            self._stats.add_duplicates(fuzz.last_skipped)
+
+    def _budget_left(self, idx: int) -> bool:
+        """Whether test case number `idx` fits in the exec and time budgets."""
+        if idx > self._num_runs:
+            return False
+        return self._deadline is None or time.time() < self._deadline
+
+    def _handle_result(self, idx: int, name: str, input_length: int, exitcode, input_bytes,
+                       err: bytes = b'', novel: bool = False, duration: float = None) -> bool:
+        """
+        Log and report the result of one test case, `exitcode` None meaning a
+        confirmed hang, `novel` whether it showed new behaviour, `duration`
+        how long it ran. In campaign mode every unique crash and hang is saved
+        and fuzzing carries on, otherwise the first one is dumped.
+
+        Returns:
+            bool: True if the run should stop.
+        """
+        self._stats.record_exec(name, exitcode)
+        self._log_result(idx, name, input_length, exitcode)
+        if self._jobs == 1:  # workers own their mutators
+            self._fuzz.feedback(name, _reward(exitcode, novel), duration)
+        if exitcode is None or exitcode < 0:
+            input_bytes = bytes(input_bytes)  # may be chunks or a view the mutator reuses
+        if exitcode is None:
+            if self._crash_store is None:
+                self._report_timeout(idx, input_bytes)
+                return True
+            self._record_finding(self._crash_store.save_hang(input_bytes, name, idx, err or b''),
+                                idx, "Timeout")
+            return False
+
+        if exitcode < 0:  # Handle SIGFAULT
+            if self._crash_store is None:
+                self._report_crash(exitcode, input_bytes)
+                self._follow_ups.append((name, input_bytes, None))
+                return True
+            buckets = self._crash_store.crashes
+            path = self._crash_store.save_crash(input_bytes, exitcode, name, idx, err or b'')
+            self._record_finding(path, idx, self._crash_store.signal_name(exitcode))
+            if self._crash_store.crashes > buckets:
+                self._follow_ups.append((name, input_bytes, path))
+        return False
+
+    def _record_finding(self, path, idx: int, reason: str):
+        if path is not None:
+            self._log.event(f"{idx}: {reason}, saved input to {path}")
+
+    def _run_follow_ups(self):
+        """
+        Minimize and bisect the crashes queued during the run. They run their
+        own targets, so they wait until fuzzing is over instead of stalling it.
+        """
+        for name, input_bytes, saved in self._follow_ups:
+            if self._minimize:
+                self._minimize_crash(input_bytes, saved)
+            self._bisect_padding(name, input_bytes)
+        self._follow_ups = []
+
+    def _report_summary(self, execs: int):
+        self._run_follow_ups()
+        if self._jobs == 1:
+            self._stats.update_weights("local", self._fuzz.method_weights())
+        self._stats.flush(final=True)
+        self._log.close()
+        if self._crash_store is None:
+            return
+        self._log.event(f"Campaign finished after {execs} execs: "
+              f"{self._crash_store.crashes} crash buckets, {self._crash_store.hangs} hang buckets")
+
+    def _report_crash(self, exitcode: int, input_bytes: bytes):
+        self._log.event(f"Program Crashed: exitcode = {exitcode}\n"
+                        f"\tReason: {process.ExitCodes(-exitcode).name}\n"
+                        f"Dumped bad input report to {self._txt_name}_dump.txt", harness.QUIET)
+        self._result_dump(input_bytes)
+
+    def _minimize_crash(self, input_bytes: bytes, saved: str = None):
+        """
+        Minimize the reported crash into `<binary>_dump.min.txt`, or with
+        `saved`, the path of a campaign crash, that bucket's smallest
+        reproducer into its `.min.txt`.
+        """
+        level = harness.QUIET if saved is None else harness.NORMAL
+        if saved is not None:
+            input_bytes = self._crash_store.smallest(saved)
+        try:
+            reduced, execs = minimize_crash(self._process_name, input_bytes, self._timeout.retry_timeout)
+        except ValueError:
+            self._log.event("The crash didn't reproduce, so the input wasn't minimized", level)
+            return
+        except (RecursionError, MemoryError, OSError) as e:
+            self._log.event(f"Minimizing failed ({e!r}), only the full input was kept", level)
+            return
+        if saved is None:
+            path = f"{self._txt_name}_dump.min.txt"
+            with open(path, "wb") as fp:
+                fp.write(reduced)
+        else:
+            path = self._crash_store.save_minimized(saved, reduced, execs)
+        self._log.event(f"Minimized bad input from {len(input_bytes)} to {len(reduced)} bytes "
+                        f"in {execs} execs, saved to {path}", level)
+
+    def _bisect_padding(self, name: str, input_bytes: bytes):
+        """If padding method `name` made `input_bytes` crash, report how much padding it takes."""
+        fields = harness.padding_fields(name, input_bytes, self._seeds) if self._bisect else []
+        if not fields:
+            return
+        try:
+            results, joint, execs = bisect_padding(self._process_name, input_bytes, fields,
+                                                   self._timeout.retry_timeout)
+        except ValueError:
+            return
+        if not results:
+            self._log.event(f"Length bisection ({name}): crashes without the padding too", harness.QUIET)
+            return
+        if joint:
+            offsets = ", ".join(str(offset) for offset, _, _ in results)
+            fields = (f"\tno field crashes alone; all {len(results)}, at offsets {offsets}, crash "
+                      f"once each is up to {max(least for _, _, least in results)} bytes long")
+        else:
+            fields = "\n".join(f"\tfield at offset {offset}: crashes from {least} of its {length} bytes"
+                               for offset, length, least in results)
+        self._log.event(f"Length bisection ({name}) in {execs} execs:\n{fields}", harness.QUIET)
+
+    def _report_timeout(self, idx: int, input_bytes: bytes):
+        self._log.event(f"{idx}: Timeout\n"
+                        f"Dumped timeout report to {self._txt_name}_dump.txt", harness.QUIET)
+        self._result_dump(input_bytes)
+
+    def _run_parallel(self):
+        """
+        Fan the test cases out over `self._jobs` worker processes.
+
+        Each worker owns a mutator and an RNG stream, and only ships the
+        input bytes back for crashes and timeouts. The coordinator keeps the
+        logging and the dump file or crash store, and stops every worker on
+        the first hit unless this is a campaign.
+        """
+        stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        rng_seed = random.randrange(1 << 32)
+        seen = harness.SeenFilter(shared=True) if self._dedup else None
+        workers = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(self._process_name, self._seeds, worker_id, self._jobs, self._num_runs, rng_seed + worker_id,
+                      self._use_forkserver, self._timeout, self._deadline,
+                      self._crash_store is not None, self._scheduler, self._feedback,
+                      self._captures, seen, stop, results),
+                daemon=True
+            )
+            for worker_id in range(self._jobs)
+        ]
+        for worker in workers:
+            worker.start()
+
+        running = len(workers)
+        execs = 0
+        errors = []
+        while running:
+            try:
+                result = results.get(timeout=WORKER_POLL)
+            except queue.Empty:
+                if any(worker.is_alive() for worker in workers):
+                    continue
+                break  # the rest died without their end marker
+            if result is None:
+                running -= 1
+                continue
+            if isinstance(result, dict):
+                if "error" in result:
+                    errors.append(f"worker {result['worker']} failed:\n{result['error']}")
+                    stop.set()
+                    continue
+                if "log" in result:
+                    self._log.event(f"worker {result['worker']}: {result['log']}")
+                    continue
+                self._stats.update_remote(result["worker"], result)
+                self._stats.update_weights(result["worker"], result["weights"])
+                continue
+            if stop.is_set():
+                continue  # keep draining so workers can exit
 
-                if exitcode < 0:  # Handle SIGFAULT
-                    print(f"Program Crashed: exitcode = {exitcode}")
-                    print(f"\tReason: {process.ExitCodes(-exitcode).name}")
-                    print(f"Dumped bad input report to {self._txt_name}_dump.txt")
-                    self._result_dump(input_bytes)
+            execs += 1
+            if self._handle_result(*result):
+                stop.set()
+
+        for worker in workers:
+            worker.join()
+        errors += [f"worker {worker_id} was killed by signal {-worker.exitcode}"
+                   for worker_id, worker in enumerate(workers) if worker.exitcode < 0]
+        self._report_summary(execs)
+        if errors:
+            raise RuntimeError("\n".join(errors))
+
+    async def _run_async(self):
+        """
+        Keep up to `self._inflight` target processes running at once from a
+        single event loop. Each process gets its own deadline, so a slow or
+        hanging input only holds its own slot. The first crash or confirmed
+        timeout cancels everything still in flight.
+        """
+        import asyncio
+        slots = asyncio.Semaphore(self._inflight)
+        stop = asyncio.Event()
+        pending = set()
+        execs = 0
+
+        async def attempt(input_bytes: bytes, timeout: float):
+            start = time.perf_counter_ns()
+            proc = await asyncio.create_subprocess_exec(
+                self._process_name,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=self._captures[0].stream,
+                stderr=self._captures[1].stream
+            )
+            spawned = time.perf_counter_ns()
+            self._stats.add_stage("spawn", spawned - start)
+            finished = False
+            try:
+                outs, err = await asyncio.wait_for(process.pipes.communicate_async(proc, input_bytes,
+                                                                               *self._captures),
+                                                   timeout=timeout)
+                finished = True
+            except asyncio.TimeoutError:
+                return None, b'', b'', timeout
+            finally:
+                if not finished:
+                    killed = time.perf_counter_ns()
+                    await process.pipes.kill_async(proc)
+                    self._stats.add_stage("teardown", time.perf_counter_ns() - killed)
+            elapsed = time.perf_counter_ns() - spawned
+            self._stats.add_stage("communicate", elapsed)
+            self._timeout.record(elapsed / 1e9)
+            return proc.returncode, outs, err, elapsed / 1e9
+
+        async def execute(idx: int, name: str, input_bytes: bytes):
+            try:
+                exitcode, outs, err, duration = await attempt(input_bytes, self._timeout.timeout)
+                if exitcode is None:
+                    exitcode, outs, err, duration = await attempt(input_bytes,
+                                                                  self._timeout.retry_timeout)
+            finally:
+                slots.release()
+
+            if stop.is_set():
+                return
+            novel = _observe(self._novelty, self._fuzz, input_bytes, exitcode, outs, err, duration)
+            if self._handle_result(idx, name, len(input_bytes), exitcode, input_bytes, err, novel,
+                                   duration):
+                stop.set()
+
+        try:
+            for idx, (input_bytes, name) in enumerate(self._fuzz, 1):
+                if not self._budget_left(idx):
                     break
+                execs = idx
+                self._record_mutation(self._fuzz)
+                await slots.acquire()
+                if stop.is_set():
+                    slots.release()
+                    break
+                task = asyncio.create_task(execute(idx, name, input_bytes))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            # reap everything still in flight before leaving the event loop
+            if stop.is_set():
+                for task in pending:
+                    task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._report_summary(execs)
+
+
+def _worker(process_name: str, seeds: list,
+            worker_id: int, jobs: int, num_runs: int, rng_seed: int,
+            use_forkserver: bool, timeout, deadline, campaign: bool, scheduler,
+            feedback: bool, captures, seen, stop, results):
+    """
+    Worker loop for `Manager._run_parallel`. Runs every `jobs`-th test case
+    and reports (idx, name, input_length, exitcode, input_bytes, err) tuples,
+    with exitcode None on a confirmed timeout. The input and the stderr tail
+    are only sent for crashes and hangs. Puts None on the queue when done,
+    also after an error, which goes first as a dict with the traceback
+    under "error". Messages for the log are sent as dicts under "log".
+
+    `timeout` is the coordinator's calibrated `process.AdaptiveTimeout`; each
+    worker keeps adapting its own copy. In a campaign the worker carries on
+    after crashes and hangs until the exec or time budget runs out.
+
+    Stage timings are kept in a local `harness.Stats` and sent as a dict
+    snapshot, together with the scheduler weights, every `STATS_EVERY` execs
+    and once more before exiting. With `feedback` the worker grows its own
+    corpus from the inputs that show new behaviour. stdout and stderr are
+    kept as the (stdout, stderr) `captures` policies say. With a `seen`
+    filter, shared by all the workers, test cases any worker has run
+    before are skipped.
+    """
+    server = None
+    try:
+        random.seed(rng_seed)
+        fuzz = _build_fuzz(seeds, scheduler, feedback,
+                           lambda message: results.put(dict(worker=worker_id, log=message)))
+        novelty = harness.NoveltyTracker() if feedback else None
+        if seen is not None:
+            fuzz = harness.UniqueInputs(fuzz, seen)
+        fuzz.use_buffer()
+        server = Manager._start_forkserver(process_name, captures) if use_forkserver else None
+        stats = harness.Stats(status_line=False)
+        for execs, idx in enumerate(itertools.count(worker_id + 1, jobs), 1):
+            if idx > num_runs or stop.is_set() or (deadline is not None and time.time() >= deadline):
+                break
+            input_bytes, name = next(fuzz)
+            stats.add_stage("mutate", fuzz.last_timings[0])
+            stats.add_stage("format", fuzz.last_timings[1])
+            if seen is not None:
+                stats.add_duplicates(fuzz.last_skipped)
+            try:
+                start = time.perf_counter()
+                outs, err, exitcode = _execute_once(process_name, server, input_bytes,
+                                                    timeout.timeout, stats, captures)
+                duration = time.perf_counter() - start
+                timeout.record(duration)
             except subprocess.TimeoutExpired:
-                print(f"{idx}: Timeout")
-                print(f"Dumped timeout report to {self._txt_name}_dump.txt")
-                self._result_dump(input_bytes)
-                break        
-            self._reset()
-        
+                start = time.perf_counter()
+                try:
+                    outs, err, exitcode = _execute_once(process_name, server, input_bytes,
+                                                        timeout.retry_timeout, stats, captures)
+                except subprocess.TimeoutExpired:
+                    outs, err, exitcode = b'', b'', None
+                duration = time.perf_counter() - start
 
-    
+            novel = _observe(novelty, fuzz, input_bytes, exitcode, outs, err, duration)
+            fuzz.feedback(name, _reward(exitcode, novel), duration)
+            found = exitcode is None or exitcode < 0
+            results.put((idx, name, len(input_bytes), exitcode,
+                         bytes(input_bytes) if found else None,
+                         err[-harness.STDERR_TAIL:] if found else None))
+            if execs % STATS_EVERY == 0:
+                results.put(dict(stats.snapshot(), worker=worker_id, weights=fuzz.method_weights()))
+            if found and not campaign:
+                break
 
+        results.put(dict(stats.snapshot(), worker=worker_id, weights=fuzz.method_weights()))
+    except Exception:
+        results.put(dict(worker=worker_id, error=traceback.format_exc()))
+    finally:
+        if server is not None:
+            server.close()
+        results.put(None)
 
 
-    
-        
-        
\ No newline at end of file
+def _mutator(seed: bytes):
+    """
+    A mutator for `seed`, of the type it sniffs as, or a plaintext one if
+    it doesn't parse as that type after all.
+    """
+    file_type = process.whichType(seed)
+    try:
+        return mutators.mutator_for(file_type)(seed)
+    except (ValueError, SyntaxError, RecursionError):  # ET.ParseError is a SyntaxError, json errors ValueErrors
+        if file_type == "plaintext":
+            raise
+        return mutators.mutator_for("plaintext")(seed)
+
+
+def _build_fuzz(seeds: list, scheduler, feedback: bool, log=None):
+    """
+    What test cases are drawn from: the seed's own mutator for a single
+    seed without `feedback`, else a `harness.Corpus` of all the seeds, so
+    several seeds are scheduled by energy and new inputs can join. The
+    corpus reports the seeds it drops to `log`.
+    """
+    if len(seeds) == 1 and not feedback:
+        fuzz = _mutator(seeds[0])
+    else:
+        fuzz = harness.Corpus(seeds, _mutator, log=log)
+    fuzz.use_scheduler(scheduler)
+    return fuzz
+
+
+def _reward(exitcode, novel: bool = False) -> float:
+    """Scheduler reward for a result: 1 for a crash, 0.5 for a hang, 0.25 for new behaviour."""
+    if exitcode is None:
+        return 0.5
+    if exitcode < 0:
+        return 1.0
+    return 0.25 if novel else 0.0
+
+
+def _observe(novelty, corpus, input_bytes: bytes, exitcode, outs: bytes, err: bytes,
+             duration: float) -> bool:
+    """
+    Check a result against the behaviours seen so far, and add inputs that
+    show new behaviour without crashing or hanging to `corpus`. Does nothing
+    when feedback is off (`novelty` is None).
+
+    Returns:
+        bool: whether the behaviour was new.
+    """
+    if novelty is None or exitcode is None:
+        return False
+    novel = novelty.observe(exitcode, outs, err, duration)
+    if novel and exitcode >= 0:
+        corpus.add(bytes(input_bytes))
+    return novel
+
+
+def _crash_runner(process_name: str, timeout: float):
+    """`run(data) -> (exitcode, stderr)` for the minimizers, exitcode None on a timeout."""
+    captures = (process.DiscardCapture(), process.BoundedCapture(harness.STDERR_TAIL))
+
+    def run(data: bytes):
+        try:
+            _, err, exitcode = _execute_once(process_name, None, data, timeout, captures=captures)
+        except subprocess.TimeoutExpired:
+            return None, b''
+        return exitcode, err
+
+    return run
+
+
+def minimize_crash(process_name: str, input_bytes: bytes, timeout: float,
+                   jobs: int = None, max_execs: int = 5000) -> Tuple[bytes, int]:
+    """
+    Shrink crashing `input_bytes` with `harness.Minimizer`, running up to
+    `jobs` (by default one per CPU) fresh processes at a time, each limited
+    to `timeout` seconds.
+
+    Returns:
+        Tuple[bytes, int]: the smallest input found that crashes the same
+        way, and the number of execs it took.
+
+    Raises:
+        ValueError: `input_bytes` doesn't crash the target.
+    """
+    minimizer = harness.Minimizer(_crash_runner(process_name, timeout), jobs or os.cpu_count() or 1, max_execs)
+    return minimizer.minimize(input_bytes), minimizer.execs
+
+
+def bisect_padding(process_name: str, input_bytes: bytes, fields: list, timeout: float,
+                   jobs: int = None, max_execs: int = 1000) -> Tuple[list, bool, int]:
+    """
+    Search the padding `fields` (see `harness.padding_fields`) of crashing
+    `input_bytes` for the least lengths that still crash, with
+    `harness.LengthBisector`, running processes as `minimize_crash` does.
+
+    Returns:
+        Tuple[list, bool, int]: the bisector's (offset, length, least
+        crashing length) for each field and whether they only crash
+        together, and the number of execs it took.
+
+    Raises:
+        ValueError: `input_bytes` doesn't crash the target.
+    """
+    bisector = harness.LengthBisector(_crash_runner(process_name, timeout), jobs or os.cpu_count() or 1, max_execs)
+    results, joint = bisector.bisect(input_bytes, fields)
+    return results, joint, bisector.execs
+
+
+def _execute_once(process_name: str, server, input_bytes: bytes, timeout: float,
+                  stats=None, captures=None) -> Tuple[bytes, bytes, int]:
+    """
+    Run a single test case through the fork server if there is one, else
+    through a fresh process, and return output, error, and exit code. A timed-out process
+    is killed before `subprocess.TimeoutExpired` is re-raised. Stage timings
+    go to `stats` if given. stdout and stderr are kept as the
+    (stdout, stderr) `captures` policies say, in full by default.
+    """
+    stats = stats or _NO_STATS
+    captures = captures or _FULL_CAPTURE
+    start = time.perf_counter_ns()
+    if server is not None:
+        result = server.run(input_bytes, timeout=timeout)
+        stats.add_stage("communicate", time.perf_counter_ns() - start)
+        return result
+
+    proc = subprocess.Popen(
+        process_name,
+        stdin=subprocess.PIPE,
+        stdout=captures[0].stream,
+        stderr=captures[1].stream
+    )
+    spawned = time.perf_counter_ns()
+    stats.add_stage("spawn", spawned - start)
+    try:
+        outs, err = process.pipes.communicate(proc, input_bytes, timeout, *captures)
+    except subprocess.TimeoutExpired:
+        killed = time.perf_counter_ns()
+        process.pipes.kill(proc)
+        stats.add_stage("teardown", time.perf_counter_ns() - killed)
+        raise
+    stats.add_stage("communicate", time.perf_counter_ns() - spawned)
+    return outs, err, proc.returncode
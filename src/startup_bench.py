@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+Startup benchmark: the time a fresh interpreter takes to get the fuzzer
+ready for a seed. That covers importing the runner, detecting the seed's
+type, and building its mutator. The bare interpreter's own startup is
+subtracted.
+
+Exits with status 1 when the median for any seed is over the budget, or
+when startup imports a module that it shouldn't load (pwntools).
+"""
+
+from argparse import ArgumentParser
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SEEDS = os.path.join(SRC, "..", "testing-bin", "*.txt")
+
+# Kept out of the startup path on purpose.
+FORBIDDEN = ("pwnlib", "pwn")
+
+_STARTUP = """
+import sys
+import mutators, process, runner
+with open(sys.argv[1], 'rb') as fp:
+    seed = fp.read()
+mutators.mutator_for(process.whichType(seed))(seed)
+print(' '.join(sorted(m for m in {forbidden} if m in sys.modules)))
+""".format(forbidden=FORBIDDEN)
+
+
+def _time(args) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=SRC, capture_output=True, check=True)
+    return time.perf_counter() - start, result.stdout.decode().split()
+
+
+def main(seeds, runs: int = 10, budget: float = 0.15) -> bool:
+    """
+    Time `runs` startups for every seed in `seeds` and print the median.
+
+    Returns:
+        bool: whether every seed started within `budget` seconds.
+    """
+    bare = statistics.median(_time(["-c", "pass"])[0] for _ in range(runs))
+    print(f"bare interpreter: {bare * 1000:.0f}ms")
+    ok = True
+    for seed in seeds:
+        times, loaded = [], []
+        for _ in range(runs):
+            elapsed, loaded = _time(["-c", _STARTUP, seed])
+            times.append(elapsed - bare)
+        median = statistics.median(times)
+        over = median > budget or loaded
+        ok = ok and not over
+        note = f" loaded {', '.join(loaded)}" if loaded else ""
+        print(f"{'FAIL' if over else 'ok  '} {median * 1000:6.0f}ms {os.path.basename(seed)}{note}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measure fuzzer startup against a time budget")
+    parser.add_argument("seeds", nargs="*", help="Seed files to start on. Defaults to the testing-bin seeds.")
+    parser.add_argument("--runs", type=int, default=10, help="Startups timed per seed; the median counts. Defaults to 10.")
+    parser.add_argument("--budget", type=float, default=0.15, help="Most seconds a startup may take on top of the bare interpreter. Defaults to 0.15.")
+    args = parser.parse_args()
+    seeds = args.seeds or sorted(glob.glob(DEFAULT_SEEDS))
+    sys.exit(0 if main([os.path.abspath(seed) for seed in seeds], args.runs, args.budget) else 1)